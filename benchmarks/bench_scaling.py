@@ -0,0 +1,93 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+# Run as a script from the repository root, which is not on sys.path then
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+from pygame import Vector2
+
+from zooma.main import ZoomaGame
+from zooma.utils.camera import SCREEN_WIDTH, SCREEN_HEIGHT
+from zooma.utils.level_generator import SHAPES, generate_level, get_level_entry, write_level, write_levels_file
+
+# How the game scales with level size, on generated levels.
+# Run from the repository root:
+#     python benchmarks/bench_scaling.py [points,points,...] [shapes]
+#
+# For every shape and path size it loads the level headlessly and reports
+# the nearest segment query used to place balls, a game tick while the
+# chain comes in, and drawing the view around the turret and the whole
+# world zoomed out.
+
+POINTS = [100, 1000, 10000, 100000]
+QUERIES = 2000
+TICKS = 600
+DRAWS = 20
+
+
+def time_queries(path, world_size: tuple[int, int], rng: random.Random) -> float:
+    positions = [Vector2(rng.uniform(0, world_size[0]), rng.uniform(0, world_size[1])) for _ in range(QUERIES)]
+    start = time.perf_counter()
+    for position in positions:
+        path.get_nearest_segment(position)
+    return (time.perf_counter() - start) / QUERIES
+
+
+def time_ticks(game: ZoomaGame) -> float:
+    state = game.state
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        game.tick(state)
+    return (time.perf_counter() - start) / TICKS
+
+
+def time_draws(game: ZoomaGame, screen: pygame.Surface) -> float:
+    start = time.perf_counter()
+    for _ in range(DRAWS):
+        for entity in game.state.entity_list:
+            entity.draw(screen, game.camera)
+    return (time.perf_counter() - start) / DRAWS
+
+
+def main():
+    sizes = [int(value) for value in sys.argv[1].split(",")] if len(sys.argv) > 1 else POINTS
+    shapes = sys.argv[2].split(",") if len(sys.argv) > 2 else SHAPES
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    rng = random.Random(0)
+
+    print(f"{'level':<28}{'world':>14}{'query us':>10}{'tick ms':>9}{'view ms':>9}{'whole ms':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        entries = []
+        for shape in shapes:
+            for points in sizes:
+                name = f"{shape}-{points}"
+                write_level(directory, name, generate_level(shape, points, seed=0))
+                entries.append(get_level_entry(name, os.path.join(directory, f"{name}.json")))
+        levels_file = write_levels_file(directory, entries)
+
+        for level, entry in enumerate(entries):
+            game = ZoomaGame(headless=True, seed=0)
+            game.init_game(levels_file)
+            state = game.load_level(level, game.state)
+            game.state = state
+            game.start_level(state)
+            path = state.entity_list[0]
+
+            query = time_queries(path, state.world_size, rng)
+            tick = time_ticks(game)
+            game.camera.center_on(state.forg.position)
+            view = time_draws(game, screen)
+            game.camera.fit_world()
+            whole = time_draws(game, screen)
+            world = "x".join(str(size) for size in state.world_size)
+            print(f"{entry['name']:<28}{world:>14}{query * 1e6:>10.1f}{tick * 1000:>9.3f}"
+                  f"{view * 1000:>9.3f}{whole * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Startup time of the game and tools, each case in a fresh interpreter.
+# Run from the repository root:
+#     python benchmarks/bench_startup.py [runs]
+#
+# "in process" is the time spent on the case's own code, "wall" includes
+# starting Python itself.
+
+CASES = {
+    "python": "pass",
+    "import zooma": "import zooma",
+    "import zooma.entities.path": "import zooma.entities.path",
+    "import zooma.editor": "import zooma.editor",
+    "import zooma.main": "import zooma.main",
+    "headless game": (
+        "from zooma.main import ZoomaGame\n"
+        "game = ZoomaGame(headless=True)\n"
+        "game.init_game()\n"
+        "game.load_level(0, game.state)"
+    ),
+}
+
+TIMER = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "exec(compile({code!r}, '<case>', 'exec'))\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def run_case(code: str) -> tuple[float, float]:
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1", SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", TIMER.format(code=code)],
+                            capture_output=True, text=True, env=env, check=True)
+    wall = time.perf_counter() - start
+    return float(result.stdout.strip().splitlines()[-1]), wall
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'case':<30}{'in process ms':>15}{'wall ms':>10}")
+    for name, code in CASES.items():
+        inner = []
+        wall = []
+        for _ in range(runs):
+            case_time, wall_time = run_case(code)
+            inner.append(case_time)
+            wall.append(wall_time)
+        print(f"{name:<30}{statistics.median(inner) * 1000:>15.1f}{statistics.median(wall) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import os
+import time
+
+import pytest
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from zooma.main import ZoomaGame, TICK_RATE
+
+# Smoke tests of a windowed game on SDL's dummy drivers, run with
+#     python -m pytest tests
+
+
+class StopGame(Exception):
+    pass
+
+
+def run_frames(game: ZoomaGame, frames: int):
+    """ Run the game loop for a number of frames """
+    wait = game.pacer.wait
+    count = 0
+
+    def counted_wait():
+        nonlocal count
+        wait()
+        count += 1
+        if count >= frames:
+            raise StopGame
+
+    game.pacer.wait = counted_wait
+    with pytest.raises(StopGame):
+        game.run()
+
+
+def test_windowed_clock_advances():
+    game = ZoomaGame()
+    start = game.get_ticks()
+    time.sleep(0.05)
+    assert game.get_ticks() >= start + 50
+
+
+def test_windowed_game_plays():
+    game = ZoomaGame()
+    # Longer than the start boost and a rewind snapshot
+    run_frames(game, 2 * TICK_RATE)
+    state = game.state
+    assert game.get_ticks() >= 1900
+    assert state.did_reset_boost
+    assert state.forg.can_shoot()
+    assert game.rewind_snapshots
@@ -0,0 +1,134 @@
+import os
+import threading
+
+import pygame
+
+from zooma.utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Sound effects for game events.
+#
+# The mixer is started on the calling thread, SDL subsystems must not be
+# initialised concurrently with the display, and every clip is decoded on a
+# background thread, so neither startup nor the first play of a clip waits
+# on disk or decoding.
+# Events that fire before their clip is ready are skipped. Effects play on
+# a small pool of reserved channels. When all of them are busy a new sound
+# replaces the lowest priority one playing, or is dropped if nothing
+# playing is less important.
+
+SOUND_DIR = "zooma/sounds"
+
+# Clips per event, several clips take turns
+EVENT_CLIPS = {
+    "match": (),
+    "combo": ("alloy_gpt-4o-mini-tts_1-25x_2025-05-19T18_56_00-124Z.wav",),
+    "chain": ("alloy_gpt-4o-mini-tts_1-25x_2025-05-19T18_56_18-288Z.wav",),
+    "zooma": ("zooma.wav",),
+    "death": (),
+}
+
+EVENT_PRIORITIES = {
+    "match": 1,
+    "combo": 2,
+    "chain": 2,
+    "zooma": 3,
+    "death": 3,
+}
+
+CHANNEL_COUNT = 8
+
+
+class SoundManager:
+    def __init__(self, sound_dir: str = SOUND_DIR,
+                 event_clips: dict[str, tuple[str, ...]] = EVENT_CLIPS,
+                 priorities: dict[str, int] = EVENT_PRIORITIES,
+                 channel_count: int = CHANNEL_COUNT):
+        self.sound_dir = sound_dir
+        self.event_clips = event_clips
+        self.priorities = priorities
+        self.channel_count = channel_count
+
+        # Filled in by start() and the loader thread
+        self.clips: dict[str, pygame.mixer.Sound] = {}
+        self.channels: list[pygame.mixer.Channel] = []
+        self.channel_priorities: list[int] = []
+        self.ready = threading.Event()
+
+        self.started = False
+        self.loader: threading.Thread | None = None
+        self.plays: dict[str, int] = {}
+        self.dropped = 0
+
+    def start(self):
+        """ Start the mixer here and load all clips in the background """
+        if self.started:
+            return
+        self.started = True
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+            if pygame.mixer.get_num_channels() < self.channel_count:
+                pygame.mixer.set_num_channels(self.channel_count)
+            # Keep the pool to ourselves
+            pygame.mixer.set_reserved(self.channel_count)
+            self.channel_priorities = [0] * self.channel_count
+            self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+        except pygame.error as e:
+            log.warning("No audio, sound effects are off: %s", e)
+            self.ready.set()
+            return
+        self.loader = threading.Thread(target=self._load, name="zooma-audio", daemon=True)
+        self.loader.start()
+
+    def _load(self):
+        filenames = sorted({filename for clips in self.event_clips.values() for filename in clips})
+        for filename in filenames:
+            path = os.path.join(self.sound_dir, filename)
+            try:
+                self.clips[filename] = pygame.mixer.Sound(path)
+            except (pygame.error, FileNotFoundError) as e:
+                log.warning("Could not load sound %s: %s", path, e)
+
+        log.debug("Loaded %d sounds", len(self.clips))
+        self.ready.set()
+
+    def wait_until_ready(self, timeout: float | None = None) -> bool:
+        return self.ready.wait(timeout)
+
+    def play(self, event: str) -> bool:
+        """ Play the clip for event without waiting, False if it was skipped """
+        clips = self.event_clips.get(event)
+        if not clips or not self.channels:
+            return False
+
+        turn = self.plays.get(event, 0)
+        self.plays[event] = turn + 1
+        sound = self.clips.get(clips[turn % len(clips)])
+        if sound is None:
+            # Still loading or failed to load
+            self.dropped += 1
+            return False
+
+        priority = self.priorities.get(event, 0)
+        index = self._get_channel(priority)
+        if index is None:
+            log.debug("Dropped sound %s, all channels busy", event)
+            self.dropped += 1
+            return False
+
+        self.channels[index].play(sound)
+        self.channel_priorities[index] = priority
+        return True
+
+    def _get_channel(self, priority: int) -> int | None:
+        """ A free channel, or the one with the least important sound below priority """
+        lowest = None
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return i
+            if self.channel_priorities[i] < priority and (
+                    lowest is None or self.channel_priorities[i] < self.channel_priorities[lowest]):
+                lowest = i
+        return lowest
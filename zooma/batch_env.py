@@ -0,0 +1,174 @@
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass
+
+import pygame
+from pygame import Vector2
+
+from zooma.main import ZoomaGame, WIDTH, HEIGHT
+from zooma.utils.numeric import FLOAT64
+
+# A convenience wrapper for training and evaluating shooting policies on K
+# independent headless games without a process per game.
+#
+#     batch = GameBatch(8, level=0, seed=1, ticks_per_step=10)
+#     result = batch.step([angle_or_none] * 8)
+#     result.score_deltas, result.dones
+#
+# The games advance in lockstep, one step() moves all of them, but each one
+# is ticked in turn with its own Chain objects. There are no shared chain
+# arrays and no vectorised stepping, so K games cost K times one game.
+#
+# An action is the angle in radians to shoot at, or None to hold fire.
+# Finished games (game over or level complete) are not stepped again until
+# they are reset. Observations are small top down renders of each game in
+# one (K, width, height, 3) uint8 NumPy array. NumPy is only needed for
+# observations and is imported when the first one is made.
+
+OBSERVATION_SIZE = (100, 80)
+
+
+@dataclass
+class StepResult:
+    score_deltas: list[int]
+    dones: list[bool]
+    observations: object = None     # numpy.ndarray when observations are on
+
+
+class GameBatch:
+    def __init__(self, count: int, level: int = 0, seed: int | None = None,
+                 numeric_mode: str = FLOAT64, ticks_per_step: int = 1,
+                 observation_size: tuple[int, int] | None = None):
+        self.level = level
+        self.ticks_per_step = ticks_per_step
+        self.observation_size = observation_size
+
+        self.games: list[ZoomaGame] = []
+        for i in range(count):
+            game = ZoomaGame(headless=True, numeric_mode=numeric_mode,
+                             seed=None if seed is None else seed + i)
+            game.init_game()
+            self.games.append(game)
+
+        self.scores = [0] * count
+        self.dones = [False] * count
+        self.total_ticks = 0
+
+        # Full size canvas every game is drawn on, then scaled down
+        self._canvas: pygame.Surface | None = None
+        self._small: pygame.Surface | None = None
+        self._observations = None
+
+        self.reset()
+
+    def __len__(self):
+        return len(self.games)
+
+    def reset(self, index: int | None = None):
+        """ Restart the level in one game, or in all of them """
+        indices = range(len(self.games)) if index is None else (index,)
+        for i in indices:
+            game = self.games[i]
+            state = game.state
+            state.current_level = self.level
+            state.score = 0
+            state.game_over = False
+            state.show_game_over = False
+            state = game.load_level(self.level, state)
+            if state is None:
+                raise ValueError(f"Could not load level {self.level}")
+            game.state = state
+            game.start_level(state)
+            self.scores[i] = 0
+            self.dones[i] = False
+
+        if self.observation_size is not None:
+            return self.observe()
+        return None
+
+    def step(self, actions: list[float | None], swaps: list[bool] | None = None) -> StepResult:
+        """ Apply one action per game, then advance every running game ticks_per_step ticks """
+        if len(actions) != len(self.games):
+            raise ValueError(f"Expected {len(self.games)} actions, got {len(actions)}")
+
+        score_deltas = []
+        for i, game in enumerate(self.games):
+            if self.dones[i]:
+                score_deltas.append(0)
+                continue
+
+            state = game.state
+            if swaps is not None and swaps[i]:
+                game.swap_held_ball(state)
+
+            angle = actions[i]
+            if angle is not None and state.forg is not None:
+                forg = state.forg
+                forg.set_heading(forg.position + Vector2(math.cos(angle), math.sin(angle)))
+                game.shoot_ball(state)
+
+            for _ in range(self.ticks_per_step):
+                game.tick(state)
+                self.total_ticks += 1
+                if state.game_over or state.level_complete:
+                    break
+
+            score_deltas.append(state.score - self.scores[i])
+            self.scores[i] = state.score
+            self.dones[i] = state.game_over or state.level_complete
+
+        observations = self.observe() if self.observation_size is not None else None
+        return StepResult(score_deltas, list(self.dones), observations)
+
+    def observe(self):
+        """ Render every game into the shared (K, width, height, 3) observation array """
+        try:
+            import numpy
+        except ImportError as e:
+            raise ImportError("GameBatch observations need numpy, pip install numpy") from e
+
+        size = self.observation_size or OBSERVATION_SIZE
+        if self._observations is None:
+            self._canvas = pygame.Surface((WIDTH, HEIGHT))
+            self._small = pygame.Surface(size)
+            self._observations = numpy.zeros((len(self.games), size[0], size[1], 3), dtype=numpy.uint8)
+
+        for i, game in enumerate(self.games):
+            self._canvas.fill((0, 0, 0))
+            # The whole level, however large
+            game.camera.fit_world()
+            for entity in game.state.entity_list:
+                entity.draw(self._canvas, game.camera)
+            pygame.transform.smoothscale(self._canvas, size, self._small)
+            pixels = pygame.surfarray.pixels3d(self._small)
+            self._observations[i] = pixels
+            # Unlocks the surface
+            del pixels
+
+        return self._observations
+
+
+def main():
+    """ Throughput with a random policy: python -m zooma.batch_env [games] [steps] """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    batch = GameBatch(count, level=0, seed=1, ticks_per_step=4)
+    policy = random.Random(1)
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        actions = [policy.uniform(-math.pi, math.pi) for _ in range(count)]
+        result = batch.step(actions)
+        for i, done in enumerate(result.dones):
+            if done:
+                batch.reset(i)
+    elapsed = time.perf_counter() - start
+
+    print(f"{count} games, {batch.total_ticks} game ticks in {elapsed:.2f}s: "
+          f"{batch.total_ticks / elapsed:.0f} game ticks per second on one core")
+
+
+if __name__ == "__main__":
+    main()
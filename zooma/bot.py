@@ -0,0 +1,279 @@
+import math
+import sys
+from dataclasses import dataclass, field
+
+from pygame import Vector2
+
+from zooma.entities.chain import Chain
+from zooma.entities.forg import Forg
+from zooma.main import ZoomaGame, ZoomaGameState, LEVELS_FILE
+from zooma.utils.colors import get_color_id
+from zooma.utils.numeric import FLOAT64
+from zooma.utils.raycast import ChainRayCaster
+
+# Automated player used to load-test and balance levels.
+#
+# The evaluator works on the chains' color runs instead of single balls. Inserting a ball
+# anywhere inside or next to a run of its own color gives the same result, so
+# every chain only needs one candidate per run, not one per insertion point.
+# Candidates for all chains are built in one pass of plain Python and stored
+# as parallel lists (one entry per candidate angle), so picking a shot is a
+# single max() over the batch. The scoring is not vectorised: a board has
+# tens of runs, too few for array math to pay for a numpy dependency.
+
+MATCH_SIZE = 3
+# How many of the top candidates to check for line of sight before giving up
+MAX_AIM_CHECKS = 8
+
+
+@dataclass
+class ColorRun:
+    color: int
+    start: int
+    length: int
+
+
+@dataclass
+class CandidateBatch:
+    """ Parallel lists describing every candidate shot for one color """
+    chains: list = field(default_factory=list)
+    indices: list = field(default_factory=list)
+    run_starts: list = field(default_factory=list)
+    run_lengths: list = field(default_factory=list)
+    angles: list = field(default_factory=list)
+    distances: list = field(default_factory=list)
+    match_counts: list = field(default_factory=list)
+    closes_gap: list = field(default_factory=list)
+    combo_counts: list = field(default_factory=list)
+    scores: list = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def best(self) -> int | None:
+        """ Index of the best scoring candidate """
+        if len(self.scores) == 0:
+            return None
+        return max(range(len(self.scores)), key=self.scores.__getitem__)
+
+    def ranked(self) -> list[int]:
+        """ Candidate indices from best to worst """
+        return sorted(range(len(self.scores)), key=self.scores.__getitem__, reverse=True)
+
+
+def get_color_runs(chain: Chain) -> list[ColorRun]:
+    runs = []
+    start = 0
+    for color_id, length in zip(chain.runs.colors, chain.runs.lengths):
+        runs.append(ColorRun(color_id, start, length))
+        start += length
+    return runs
+
+
+def get_path_chains(chains: list[Chain]) -> dict:
+    """ Group chains by path, ordered from the death hole back to the emitter """
+    path_chains = {}
+    for chain in chains:
+        if len(chain) == 0:
+            continue
+        path_chains.setdefault(chain.path, []).append(chain)
+
+    for path_list in path_chains.values():
+        path_list.sort(key=Chain.get_head_offset, reverse=True)
+
+    return path_chains
+
+
+class ShotEvaluator:
+    def __init__(self, chains: list[Chain]):
+        """ Precompute color runs and chain neighbours for the current board """
+        self.runs: dict[Chain, list[ColorRun]] = {}
+        self.ahead: dict[Chain, Chain | None] = {}
+        self.behind: dict[Chain, Chain | None] = {}
+
+        for path_list in get_path_chains(chains).values():
+            for i, chain in enumerate(path_list):
+                self.runs[chain] = get_color_runs(chain)
+                self.ahead[chain] = path_list[i - 1] if i > 0 else None
+                self.behind[chain] = path_list[i + 1] if i < len(path_list) - 1 else None
+
+    def _gap_result(self, left: ColorRun | None, right: ColorRun | None) -> tuple[bool, int]:
+        """ Does removing the run between left and right close a gap, and how big is the combo """
+        if left is None or right is None or left.color != right.color:
+            return False, 0
+        combo_count = left.length + right.length
+        return True, combo_count if combo_count >= MATCH_SIZE else 0
+
+    def evaluate(self, position: Vector2, color) -> CandidateBatch:
+        """ Score inserting a ball of color near every run of every chain """
+        batch = CandidateBatch()
+        origin_x, origin_y = position.x, position.y
+        color_id = get_color_id(color)
+
+        for chain, runs in self.runs.items():
+            ahead_chain = self.ahead[chain]
+            behind_chain = self.behind[chain]
+
+            for r, run in enumerate(runs):
+                is_match = run.color == color_id
+                match_count = run.length + 1 if is_match else 1
+
+                closes_gap = False
+                combo_count = 0
+                if match_count >= MATCH_SIZE:
+                    if r > 0:
+                        left = runs[r - 1]
+                    elif ahead_chain is not None:
+                        left = self.runs[ahead_chain][-1]
+                    else:
+                        left = None
+
+                    if r < len(runs) - 1:
+                        right = runs[r + 1]
+                    elif behind_chain is not None:
+                        right = self.runs[behind_chain][0]
+                    else:
+                        right = None
+
+                    closes_gap, combo_count = self._gap_result(left, right)
+
+                # Aim at the middle of the run
+                index = run.start + run.length // 2
+                target = chain.data[index].ball.position
+                dx = target.x - origin_x
+                dy = target.y - origin_y
+
+                batch.chains.append(chain)
+                batch.indices.append(index)
+                batch.run_starts.append(run.start)
+                batch.run_lengths.append(run.length)
+                batch.angles.append(math.atan2(dy, dx))
+                batch.distances.append(math.hypot(dx, dy))
+                batch.match_counts.append(match_count)
+                batch.closes_gap.append(closes_gap)
+                batch.combo_counts.append(combo_count)
+                batch.scores.append(self._score(match_count, closes_gap, combo_count))
+
+        return batch
+
+    def _score(self, match_count: int, closes_gap: bool, combo_count: int) -> float:
+        if match_count < MATCH_SIZE:
+            # Building a pair is better than leaving a stray ball
+            return 0.5 if match_count == 2 else 0
+
+        score = match_count * 10
+        if closes_gap:
+            score += 5
+        if combo_count:
+            score += combo_count * 20
+        return score
+
+
+class BotAgent:
+    def __init__(self, game: ZoomaGame, state: ZoomaGameState):
+        self.game = game
+        self.state = state
+
+    @property
+    def forg(self) -> Forg:
+        return self.state.forg
+
+    def get_chains(self) -> list[Chain]:
+        return [entity for entity in self.state.entity_list if isinstance(entity, Chain)]
+
+    def set_heading(self, angle: float):
+        """ Aim the forg at an angle in radians """
+        self.forg.set_heading(self.forg.position + Vector2(math.cos(angle), math.sin(angle)))
+
+    def shoot(self) -> bool:
+        shot_count = len(self.state.entity_list)
+        self.game.shoot_ball(self.state)
+        return len(self.state.entity_list) > shot_count
+
+    def swap(self):
+        self.game.swap_held_ball(self.state)
+
+    def act(self) -> bool:
+        """ Pick the best shot for the held or reserve ball and take it """
+        forg = self.forg
+        if forg is None or not forg.can_shoot():
+            return False
+
+        chains = self.get_chains()
+        evaluator = ShotEvaluator(chains)
+        caster = ChainRayCaster(chains)
+
+        choices = [self.choose_shot(evaluator, caster, forg.held_ball.color)]
+        if forg.reserve_ball is not None:
+            choices.append(self.choose_shot(evaluator, caster, forg.reserve_ball.color))
+
+        best_choice = max(range(len(choices)), key=lambda i: choices[i][1])
+        angle, score = choices[best_choice]
+        if angle is None:
+            return False
+
+        if best_choice == 1:
+            self.swap()
+
+        self.set_heading(angle)
+        return self.shoot()
+
+    def choose_shot(self, evaluator: ShotEvaluator, caster: ChainRayCaster, color) -> tuple[float | None, float]:
+        """ Best (angle, score) for a color whose shot actually reaches its target run """
+        batch = evaluator.evaluate(self.forg.position, color)
+        ranked = batch.ranked()
+        if len(ranked) == 0:
+            return None, float('-inf')
+
+        for i in ranked[:MAX_AIM_CHECKS]:
+            angle = batch.angles[i]
+            hit = caster.cast_from_forg(self.forg, Vector2(math.cos(angle), math.sin(angle)))
+            if hit is None or hit.chain is not batch.chains[i]:
+                continue
+
+            index = hit.insertion_record.index
+            if batch.run_starts[i] <= index <= batch.run_starts[i] + batch.run_lengths[i]:
+                return angle, batch.scores[i]
+
+        # Nothing lined up, take the best shot anyway
+        best = ranked[0]
+        return batch.angles[best], min(batch.scores[best], 0)
+
+
+def run_bot(level: int = 0, max_ticks: int = 20000, seed: int | None = None,
+            numeric_mode: str = FLOAT64, on_tick=None, levels_file: str = LEVELS_FILE) -> ZoomaGameState:
+    """ Play one level headlessly with the bot and return the final state
+
+    on_tick(game, state, tick) is called after every tick, e.g. to draw it.
+    """
+    game = ZoomaGame(headless=True, numeric_mode=numeric_mode, seed=seed)
+    game.init_game(levels_file)
+    state = game.state
+    state.current_level = level
+    state = game.load_level(level, state)
+    game.state = state
+    game.start_level(state)
+
+    agent = BotAgent(game, state)
+    for tick in range(max_ticks):
+        agent.act()
+        game.tick(state)
+        if on_tick is not None:
+            on_tick(game, state, tick)
+        if state.show_game_over or state.level_complete:
+            break
+
+    return state
+
+
+def main():
+    level = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    numeric_mode = sys.argv[2] if len(sys.argv) > 2 else FLOAT64
+    levels_file = sys.argv[3] if len(sys.argv) > 3 else LEVELS_FILE
+    state = run_bot(level, numeric_mode=numeric_mode, levels_file=levels_file)
+    print(f"Level {state.level_name}: score {state.score}, "
+          f"complete {state.level_complete}, game over {state.game_over}")
+
+
+if __name__ == "__main__":
+    main()
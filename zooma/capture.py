@@ -0,0 +1,214 @@
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+
+import pygame
+
+from zooma.utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Gameplay video capture.
+#
+# capture() copies the screen's pixels into one of a few preallocated
+# buffers and hands it to a writer thread, no other copy or conversion
+# happens on the game loop. When every buffer is still waiting to be
+# written the frame is dropped instead of stalling the game. The writer
+# saves a PNG sequence, a raw RGB file, or pipes to ffmpeg when it is
+# installed. Set ZOOMA_CAPTURE to an output path to record a session:
+#
+#     ZOOMA_CAPTURE=session.mp4 zooma
+#
+# or render a bot game headlessly, as fast as it can be drawn:
+#
+#     python -m zooma.capture out.mp4 [level] [seed]
+
+PNG = "png"
+RAW = "raw"
+FFMPEG = "ffmpeg"
+CAPTURE_FORMATS = (PNG, RAW, FFMPEG)
+
+# Frames waiting for the writer, more are dropped
+QUEUE_FRAMES = 8
+CAPTURE_FPS = 60
+
+
+def get_capture_format(output: str) -> str:
+    """ Format for output from its extension, a path without one is a PNG directory """
+    extension = os.path.splitext(output)[1].lower()
+    if extension in (".rgb", ".raw"):
+        return RAW
+    if extension == "":
+        return PNG
+    if shutil.which("ffmpeg") is None:
+        log.warning("ffmpeg not found, writing raw frames instead of %s", output)
+        return RAW
+    return FFMPEG
+
+
+class FrameCapture:
+    def __init__(self, output: str, size: tuple[int, int], capture_format: str | None = None,
+                 fps: int = CAPTURE_FPS, queue_frames: int = QUEUE_FRAMES, block: bool = False):
+        """ block waits for the writer instead of dropping frames, for offline rendering """
+        self.output = output
+        self.size = size
+        self.format = capture_format or get_capture_format(output)
+        if self.format not in CAPTURE_FORMATS:
+            raise ValueError(f"Unknown capture format {self.format}, expected one of {CAPTURE_FORMATS}")
+        self.fps = fps
+        self.block = block
+
+        # Pixel buffers cycle between free and written, their count bounds the queue
+        self.free: queue.Queue = queue.Queue()
+        self.pending: queue.Queue = queue.Queue()
+        self.queue_frames = queue_frames
+        self.frame_format: pygame.Surface | None = None
+
+        self.captured = 0
+        self.written = 0
+        self.dropped = 0
+
+        self.ffmpeg: subprocess.Popen | None = None
+        self.raw_file = None
+        self.writer = threading.Thread(target=self._write_frames, name="zooma-capture", daemon=True)
+        self.writer_started = False
+
+    def _start(self, surface: pygame.Surface):
+        # Buffers match the screen's own pixel layout, so grabbing is one memcpy
+        self.frame_format = pygame.Surface(surface.get_size(), 0, surface)
+        frame_bytes = surface.get_pitch() * surface.get_height()
+        for _ in range(self.queue_frames):
+            self.free.put(bytearray(frame_bytes))
+
+        width, height = surface.get_size()
+        if self.format == PNG:
+            os.makedirs(self.output, exist_ok=True)
+        elif self.format == RAW:
+            self.raw_file = open(self.output, "wb")
+        else:
+            self.ffmpeg = subprocess.Popen(
+                ["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                 "-s", f"{width}x{height}", "-r", str(self.fps), "-i", "-",
+                 "-pix_fmt", "yuv420p", self.output],
+                stdin=subprocess.PIPE)
+
+        self.writer.start()
+        self.writer_started = True
+        log.info("Capturing %s to %s", self.format, self.output)
+
+    def capture(self, surface: pygame.Surface) -> bool:
+        """ Queue the current contents of surface, False if the frame was dropped """
+        if not self.writer_started:
+            self._start(surface)
+        elif not self.writer.is_alive():
+            # Writing failed, see the log
+            self.dropped += 1
+            return False
+
+        try:
+            pixels = self.free.get(block=self.block)
+        except queue.Empty:
+            self.dropped += 1
+            return False
+
+        view = surface.get_view("0")
+        pixels[:] = view
+        # Unlocks the surface
+        del view
+
+        self.captured += 1
+        self.pending.put(pixels)
+        return True
+
+    def _write_frames(self):
+        frame = self.frame_format
+        while True:
+            pixels = self.pending.get()
+            if pixels is None:
+                break
+            view = frame.get_view("0")
+            memoryview(view)[:] = pixels
+            del view
+            self.free.put(pixels)
+            try:
+                self._write_frame(frame)
+            except (OSError, pygame.error) as e:
+                log.error("Stopped capturing, could not write frame: %s", e)
+                break
+            self.written += 1
+
+    def _write_frame(self, frame: pygame.Surface):
+        if self.format == PNG:
+            pygame.image.save(frame, os.path.join(self.output, f"frame_{self.written:06d}.png"))
+        elif self.format == RAW:
+            self.raw_file.write(pygame.image.tobytes(frame, "RGB"))
+        else:
+            self.ffmpeg.stdin.write(pygame.image.tobytes(frame, "RGB"))
+
+    def close(self):
+        """ Write out every queued frame and finish the file """
+        if not self.writer_started:
+            return
+        self.pending.put(None)
+        self.writer.join()
+
+        if self.raw_file is not None:
+            self.raw_file.close()
+            width, height = self.size
+            # Raw frames carry no header, say how to read them. Dropped frames
+            # are simply missing, so the video runs fast by that many frames
+            with open(self.output + ".json", "w") as f:
+                json.dump({"width": width, "height": height, "pix_fmt": "rgb24", "fps": self.fps,
+                           "frames": self.written, "dropped": self.dropped}, f)
+        if self.ffmpeg is not None:
+            self.ffmpeg.stdin.close()
+            self.ffmpeg.wait()
+
+        log.info("Captured %d frames to %s, dropped %d", self.written, self.output, self.dropped)
+        if self.dropped:
+            log.warning("%d frames were dropped, the video plays faster than the game did around them",
+                        self.dropped)
+
+
+def capture_from_env(size: tuple[int, int]) -> FrameCapture | None:
+    """ FrameCapture for ZOOMA_CAPTURE, if it is set """
+    output = os.environ.get("ZOOMA_CAPTURE")
+    if not output:
+        return None
+    return FrameCapture(output, size)
+
+
+def main():
+    """ Render a bot game to video without a window """
+    from zooma.bot import run_bot
+    from zooma.main import WIDTH, HEIGHT, TICK_RATE
+    from zooma.utils.log import configure_from_env
+
+    configure_from_env()
+    output = sys.argv[1] if len(sys.argv) > 1 else "zooma_capture"
+    level = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    screen = pygame.Surface((WIDTH, HEIGHT))
+    capture = FrameCapture(output, (WIDTH, HEIGHT), block=True)
+    ticks_per_frame = max(1, TICK_RATE // capture.fps)
+
+    def on_tick(game, state, tick):
+        if tick % ticks_per_frame == 0:
+            game.screen = screen
+            game.update_display(state)
+            capture.capture(screen)
+
+    try:
+        state = run_bot(level, seed=seed, on_tick=on_tick)
+    finally:
+        capture.close()
+    print(f"Level {state.level_name}: score {state.score}, {capture.written} frames written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,26 +2,30 @@ import pygame
 import json
 from pygame import Vector2
 from zooma.entities.path import Path
+from zooma.utils.level_validation import validate_level, write_compiled_level
+from zooma.utils.camera import Camera, SCREEN_WIDTH, SCREEN_HEIGHT, SCROLL_SPEED, ZOOM_STEP, get_world_size
+import math
 import os
 
 # This editor was created with the assistance of Windsurf AI to enable creating the data needed
 # for the levels used by the Zooma Game.  Most of this code is AI generated.
 
-# Initialize pygame
-pygame.init()
-
 # Constants
-WIDTH, HEIGHT = 1000, 800
+WIDTH, HEIGHT = SCREEN_WIDTH, SCREEN_HEIGHT
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 BLUE = (0, 0, 255)
 GREEN = (0, 255, 0)
 RED = (255, 0, 0)
 
-# Set up display
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Zooma Level Editor")
-clock = pygame.time.Clock()
+FPS = 60
+
+# Only the newest SMOOTH_WINDOW points are smoothed, older points are final
+SMOOTH_WINDOW = 75
+# The world keeps this much room past the furthest point, so it grows while drawing towards an edge
+WORLD_ROOM = 400
+# Saved world sizes are rounded up to this
+WORLD_STEP = 100
 
 # Editor state
 class EditorState:
@@ -46,11 +50,61 @@ class EditorState:
         self.turret_position = None
         self.turret_radius = 40
         self.placing_turret = False
+        # Grid, finished paths and the turret are drawn once onto this surface
+        # and only redrawn after an edit
+        self.canvas = None
+        self.canvas_dirty = True
+        self.status_font = None
+        self.status_text = None
+        self.status_surface = None
+        # Levels can be larger than the window, see zooma.utils.camera
+        self.world_size = (WIDTH, HEIGHT)
+        self.camera = Camera((WIDTH, HEIGHT))
+
+    def get_content_size(self) -> tuple[int, int]:
+        """ Smallest world holding every path and the turret, rounded up to WORLD_STEP """
+        max_x, max_y = 0, 0
+        for path in self.paths + [self.current_path]:
+            for point in path.points:
+                max_x = max(max_x, point.x)
+                max_y = max(max_y, point.y)
+        if self.turret_position:
+            max_x = max(max_x, self.turret_position[0] + self.turret_radius)
+            max_y = max(max_y, self.turret_position[1] + self.turret_radius)
+        return (math.ceil((max_x + 1) / WORLD_STEP) * WORLD_STEP,
+                math.ceil((max_y + 1) / WORLD_STEP) * WORLD_STEP)
+
+    def grow_world(self, pos):
+        """ Make room to keep drawing past pos """
+        width = max(self.world_size[0], pos[0] + WORLD_ROOM)
+        height = max(self.world_size[1], pos[1] + WORLD_ROOM)
+        if (width, height) != self.world_size:
+            self.world_size = (width, height)
+            self.camera.set_world_size(self.world_size)
+            self.invalidate_canvas()
+
+    def scroll(self, dx: float, dy: float):
+        self.camera.scroll(dx, dy)
+        self.invalidate_canvas()
+
+    def zoom(self, steps: int, screen_pos):
+        self.camera.zoom_at(ZOOM_STEP ** steps, screen_pos)
+        self.invalidate_canvas()
+
+    def invalidate_canvas(self):
+        self.canvas_dirty = True
+
+    def set_turret(self, position):
+        self.turret_position = position
+        if position is not None:
+            self.grow_world(position)
+        self.invalidate_canvas()
 
     def add_path(self):
         """Add the current path to the list and start a new one"""
         if len(self.current_path.points) > 1:  # Only add if path has at least 2 points
             self.paths.append(self.current_path)
+            self.invalidate_canvas()
         self.current_path = Path([])
         self.last_point = None
         self.drawing = False
@@ -60,6 +114,9 @@ class EditorState:
         # Add current path to paths list only if it has points
         if len(self.current_path.points) > 1:
             self.paths.append(self.current_path)
+            self.current_path = Path([])
+            self.last_point = None
+            self.invalidate_canvas()
         
         # Check if we have any paths to save
         if len(self.paths) == 0:
@@ -114,19 +171,34 @@ class EditorState:
                         data["turret"] = {
                             "position": [int(self.turret_position[0]), int(self.turret_position[1])]
                         }
+
+                    # Only levels larger than the window need a world size
+                    width, height = self.get_content_size()
+                    if width > WIDTH or height > HEIGHT:
+                        data["world"] = {
+                            "size": [max(width, WIDTH), max(height, HEIGHT)]
+                        }
                     
                     # No need to add current_path again since it's already in paths list
                     
                     if len(data["paths"]) == 0:
                         print("No paths to save")
                         return True
+
+                    # Refuse levels the game can't play, report the rest
+                    report = validate_level(data)
+                    print(report.summary())
+                    if not report.is_valid():
+                        print("Level not saved, fix the errors above first")
+                        return True
                     
                     os.makedirs("zooma/levels", exist_ok=True)
                     with open(filename, "w") as f:
                         json.dump(data, f, indent=4)
+                    compiled_filename = write_compiled_level(filename, data)
                     
                     self.last_saved = pygame.time.get_ticks()
-                    print(f"Paths saved to {filename}")
+                    print(f"Paths saved to {filename} and {compiled_filename}")
                     self.input_active = False
                     return True
                 else:
@@ -152,6 +224,11 @@ class EditorState:
                             self.current_path = Path([])
                             self.last_point = None
                             self.drawing = False
+                            self.world_size = get_world_size(data)
+                            self.camera.set_world_size(self.world_size)
+                            self.camera.reset()
+                            self.grow_world(self.get_content_size())
+                            self.invalidate_canvas()
                             print(f"Paths loaded from {filename}")
                             self.input_active = False
                             return True
@@ -185,6 +262,67 @@ class EditorState:
 
     def toggle_grid(self):
         self.show_grid = not self.show_grid
+        self.invalidate_canvas()
+
+    def draw_canvas(self, screen):
+        """Draw the cached background, rebuilding it first if anything changed"""
+        if self.canvas is None or self.canvas_dirty:
+            if self.canvas is None:
+                self.canvas = pygame.Surface(screen.get_size())
+            self.render_canvas(self.canvas)
+            self.canvas_dirty = False
+        screen.blit(self.canvas, (0, 0))
+
+    def render_canvas(self, surface):
+        surface.fill(WHITE)
+        camera = self.camera
+        
+        # Draw grid if enabled, only the part in view
+        if self.show_grid:
+            min_x, min_y, max_x, max_y = camera.get_view_rect()
+            step = self.grid_size
+            for x in range(max(0, int(min_x) // step * step), int(min(max_x, self.world_size[0])) + 1, step):
+                pygame.draw.line(surface, (200, 200, 200), camera.to_screen((x, max(0, min_y))),
+                                 camera.to_screen((x, min(max_y, self.world_size[1]))))
+            for y in range(max(0, int(min_y) // step * step), int(min(max_y, self.world_size[1])) + 1, step):
+                pygame.draw.line(surface, (200, 200, 200), camera.to_screen((max(0, min_x), y)),
+                                 camera.to_screen((min(max_x, self.world_size[0]), y)))
+
+        # Draw all paths
+        for i, path in enumerate(self.paths):
+            color = (100 + (i * 50) % 155, 100 + (i * 30) % 155, 100 + (i * 70) % 155)
+            if len(path.points) > 1:
+                self.draw_path(surface, path, color)
+
+        # Draw saved turret
+        if self.turret_position:
+            pygame.draw.circle(surface, (128, 128, 128), camera.to_screen(self.turret_position),
+                               camera.scale(self.turret_radius))
+
+    def draw_path(self, surface, path, color):
+        """ Draw a path and its points through the camera, the first green and the last red """
+        camera = self.camera
+        points = [camera.to_screen(point) for point in path.points]
+        pygame.draw.lines(surface, color, False, points, 3)
+        radius = camera.scale(5)
+        for j, point in enumerate(points):
+            point_color = GREEN if j == 0 else RED if j == len(points) - 1 else color
+            pygame.draw.circle(surface, point_color, point, radius)
+
+    def draw_status(self, screen):
+        """Draw the status line, only rendering the text again when it changes"""
+        if self.status_font is None:
+            self.status_font = pygame.font.Font(None, 24)
+
+        text = f"Points: {len(self.current_path.points)} | {'Drawing' if self.drawing else 'Not drawing'}"
+        if self.last_saved is not None:
+            time_since_save = (pygame.time.get_ticks() - self.last_saved) / 1000
+            text += f" | Last saved: {time_since_save:.1f}s ago"
+
+        if text != self.status_text:
+            self.status_text = text
+            self.status_surface = self.status_font.render(text, True, BLACK)
+        screen.blit(self.status_surface, (10, 10))
 
     def draw_input(self, screen):
         """Draw the input prompt and text"""
@@ -218,6 +356,10 @@ class EditorState:
         self.current_path = Path([])
         self.last_point = None
         self.drawing = False
+        self.world_size = (WIDTH, HEIGHT)
+        self.camera.set_world_size(self.world_size)
+        self.camera.reset()
+        self.invalidate_canvas()
 
     def undo_last_points(self, count=10):
         """Remove the last 'count' points from the path"""
@@ -226,7 +368,7 @@ class EditorState:
             
         # Keep at least the first point
         points_to_keep = max(1, len(self.current_path.points) - count)
-        self.current_path.points = self.current_path.points[:points_to_keep]
+        self.current_path.truncate(points_to_keep)
         
         # Update last_point if it was removed
         if len(self.current_path.points) > 0:
@@ -253,43 +395,46 @@ class EditorState:
         self.current_path.addPoint(new_point)
         self.last_point = pos
         self.smooth_path()
+        self.grow_world(pos)
 
     def smooth_path(self):
-        """Smooth only the last 50 points of the path"""
-        if len(self.current_path.points) < 3:
+        """Smooth only the last SMOOTH_WINDOW points of the path
+
+        Points before the window are committed and never touched again, so
+        each call costs the same no matter how long the path already is.
+        """
+        points = self.current_path.points
+        if len(points) < 3:
             return
 
-        # Create a new list of smoothed points
-        smoothed_points = []
+        # First point always stays the same
+        start = max(1, len(points) - SMOOTH_WINDOW)
         
-        # First point stays the same
-        smoothed_points.append(self.current_path.points[0])
-        
-        # Keep all points except the last 75 unchanged
-        for i in range(1, len(self.current_path.points) - 75):
-            smoothed_points.append(self.current_path.points[i])
-        
-        # Smooth the last 75 points
-        for i in range(max(1, len(self.current_path.points) - 75), len(self.current_path.points) - 1):
-            # Take average of current point and its neighbors
-            avg_x = (self.current_path.points[i-1].x + 
-                    self.current_path.points[i].x * 2 + 
-                    self.current_path.points[i+1].x) / 4
-            avg_y = (self.current_path.points[i-1].y + 
-                    self.current_path.points[i].y * 2 + 
-                    self.current_path.points[i+1].y) / 4
+        # Smooth the window, take average of each point and its neighbors
+        smoothed_points = []
+        for i in range(start, len(points) - 1):
+            avg_x = (points[i-1].x + points[i].x * 2 + points[i+1].x) / 4
+            avg_y = (points[i-1].y + points[i].y * 2 + points[i+1].y) / 4
             smoothed_points.append(Vector2(avg_x, avg_y))
         
         # Last point stays the same
-        smoothed_points.append(self.current_path.points[-1])
+        smoothed_points.append(points[-1])
         
-        # Update the path with smoothed points
-        self.current_path.clear()
+        # Replace just the window, addPoint keeps the minimum spacing
+        self.current_path.truncate(start)
         for point in smoothed_points:
             self.current_path.addPoint(point)
 
 def main():
     """Main entry point for the level editor"""
+    # Initialize pygame, only when the editor runs so importing this module is free
+    pygame.init()
+
+    # Set up display
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Zooma Level Editor")
+    clock = pygame.time.Clock()
+
     # Initialize editor
     state = EditorState()
 
@@ -317,12 +462,15 @@ def main():
                         elif event.key == pygame.K_f:
                             state.placing_turret = not state.placing_turret
                             if not state.placing_turret:
-                                state.turret_position = None
+                                state.set_turret(None)
                         elif event.key == pygame.K_ESCAPE:
                             running = False
                 else:
                     # Only process shortcuts when input is not active
-                    if event.key == pygame.K_s:
+                    if event.key == pygame.K_HOME:
+                        state.camera.reset()
+                        state.invalidate_canvas()
+                    elif event.key == pygame.K_s:
                         state.save_paths()
                     elif event.key == pygame.K_l:
                         state.load_paths()
@@ -337,17 +485,22 @@ def main():
                     elif event.key == pygame.K_f:
                         state.placing_turret = not state.placing_turret
                         if not state.placing_turret:
-                            state.turret_position = None
+                            state.set_turret(None)
                     elif event.key == pygame.K_ESCAPE:
                         running = False
             
+            elif event.type == pygame.MOUSEWHEEL:
+                if not state.input_active:
+                    state.zoom(event.y, pygame.mouse.get_pos())
+
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:  # Left click
+                    pos = tuple(state.camera.to_world(event.pos))
                     if state.placing_turret:
-                        state.turret_position = event.pos
+                        state.set_turret(pos)
                     else:
                         state.drawing = True
-                        state.add_point(event.pos)
+                        state.add_point(pos)
             
             elif event.type == pygame.MOUSEBUTTONUP:
                 if event.button == 1:  # Left click
@@ -355,62 +508,37 @@ def main():
             
             elif event.type == pygame.MOUSEMOTION:
                 if state.drawing:
-                    state.add_point(event.pos)
-
-        # Draw everything
-        screen.fill(WHITE)
-        
-        # Draw grid if enabled
-        if state.show_grid:
-            for x in range(0, WIDTH, state.grid_size):
-                pygame.draw.line(screen, (200, 200, 200), (x, 0), (x, HEIGHT))
-            for y in range(0, HEIGHT, state.grid_size):
-                pygame.draw.line(screen, (200, 200, 200), (0, y), (WIDTH, y))
-
-        # Draw all paths
-        for i, path in enumerate(state.paths):
-            color = (100 + (i * 50) % 155, 100 + (i * 30) % 155, 100 + (i * 70) % 155)
-            if len(path.points) > 1:
-                pygame.draw.lines(screen, color, False, path.points, 3)
-                
-                # Draw points
-                for j, point in enumerate(path.points):
-                    point_color = GREEN if j == 0 else RED if j == len(path.points) - 1 else color
-                    pygame.draw.circle(screen, point_color, point, 5)
+                    state.add_point(tuple(state.camera.to_world(event.pos)))
+
+        # Scroll while arrow keys are held
+        if not state.input_active:
+            keys = pygame.key.get_pressed()
+            dx = keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]
+            dy = keys[pygame.K_DOWN] - keys[pygame.K_UP]
+            if dx or dy:
+                state.scroll(dx * SCROLL_SPEED / FPS, dy * SCROLL_SPEED / FPS)
+
+        # Draw the cached grid, finished paths and turret
+        state.draw_canvas(screen)
         
         # Draw current path
         if len(state.current_path.points) > 1:
-            pygame.draw.lines(screen, BLUE, False, state.current_path.points, 3)
-            
-            # Draw points
-            for i, point in enumerate(state.current_path.points):
-                color = GREEN if i == 0 else RED if i == len(state.current_path.points) - 1 else BLUE
-                pygame.draw.circle(screen, color, point, 5)
+            state.draw_path(screen, state.current_path, BLUE)
 
         # Draw turret preview
         if state.placing_turret:
             mouse_pos = pygame.mouse.get_pos()
-            pygame.draw.circle(screen, (128, 128, 128), mouse_pos, state.turret_radius, 2)
+            pygame.draw.circle(screen, (128, 128, 128), mouse_pos, state.camera.scale(state.turret_radius), 2)
         
-        # Draw saved turret
-        if state.turret_position:
-            pygame.draw.circle(screen, (128, 128, 128), state.turret_position, state.turret_radius)
-
         # Draw status text
-        font = pygame.font.Font(None, 24)
-        text = f"Points: {len(state.current_path.points)} | {'Drawing' if state.drawing else 'Not drawing'}"
-        if state.last_saved is not None:
-            time_since_save = (pygame.time.get_ticks() - state.last_saved) / 1000
-            text += f" | Last saved: {time_since_save:.1f}s ago"
-        text_surface = font.render(text, True, BLACK)
-        screen.blit(text_surface, (10, 10))
+        state.draw_status(screen)
 
         # Draw input if active
         state.draw_input(screen)
 
         # Update display
         pygame.display.flip()
-        clock.tick(60)
+        clock.tick(FPS)
 
     pygame.quit()
 
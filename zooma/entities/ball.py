@@ -4,6 +4,7 @@ import pygame
 
 from pygame import Color, Vector2
 from zooma.entities.entity import Entity
+from zooma.utils.camera import Camera, draw_circle
 
 DEBUG = False
 
@@ -15,16 +16,26 @@ class Ball(Entity):
         self.color = color
         # TODO: This implies new
         self.is_shot_ball = False
-        self.font = pygame.font.Font(None, 18)
+        # Only needed for debug labels, created on first use
+        self.font = None
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, self.color, self.position, self.radius)
+    def reset(self, position: Vector2, color):
+        """ Reuse this ball as if it was just created, see zooma.utils.pool """
+        self.position = Vector2(position)
+        self.color = color
+
+    def draw(self, screen, camera: Camera | None = None):
+        if camera is not None and not camera.is_visible(self.position, self.radius):
+            return
+        draw_circle(screen, camera, self.color, self.position, self.radius)
         if DEBUG:
             label = self.get_label()
             if label is not None:
-                self.draw_text(screen, label, self.position)
+                self.draw_text(screen, label, self.position if camera is None else camera.to_screen(self.position))
 
     def draw_text(self, screen: pygame.Surface, text: str, pos: Vector2):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 18)
         text_surface = self.font.render(text, True, Color('white'))
         text_rect = text_surface.get_rect(center=pos)
         screen.blit(text_surface, text_rect)
@@ -48,6 +59,9 @@ class HeldBall(Ball):
         position = Vector2(0, 0)
         super().__init__(position, color)
 
+    def reset(self, color: Color):
+        super().reset(Vector2(0, 0), color)
+
     def set_position(self, position):
         self.position = Vector2(position)
 
@@ -61,6 +75,11 @@ class ShotBall(Ball):
         self.heading = Vector2(0, -1)
         self.speed = 10
 
+    def reset(self, position, color: Color):
+        super().reset(position, color)
+        self.heading = Vector2(0, -1)
+        self.speed = 10
+
     def set_heading(self, heading: Vector2):
         self.heading = heading
         
@@ -77,6 +96,16 @@ class ChainBall(Ball):
         self.infront: ChainBall = None
         self.chain_id = None
 
+    def reset(self, position, color: Color):
+        super().reset(position, color)
+        self.speed = 2
+        self.behind = None
+        self.infront = None
+        self.chain_id = None
+        # Ids are handed out again by the chain that takes the ball
+        self.__dict__.pop('id', None)
+        self.__dict__.pop('target_id', None)
+
     def with_color(self, color):
         self.color = color
         return self
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import logging
 from pygame.math import Vector2
 
 from zooma.entities.entity import Entity
@@ -6,13 +7,32 @@ from zooma.entities.ball import ChainBall, Ball, ShotBall
 from zooma.entities.path import Path
 
 from zooma.utils.vector import to_heading
-from zooma.utils.distance import get_distance_between
+from zooma.utils.colors import get_color_id
+from zooma.utils.color_runs import ColorRuns
+from zooma.utils.blocklist import BlockList
+from zooma.utils.camera import Camera
+from zooma.utils.ids import IdAllocator
+from zooma.utils.events import (EventBus, CHAIN_CREATED, BALLS_ADDED, BALLS_REMOVED, CHAIN_EMPTIED,
+                                 CHAIN_SPLIT, CHAIN_MERGED)
+from zooma.utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Balls past either end of the part of the path in view that are still drawn, in radii
+DRAW_MARGIN_BALLS = 8
+# Shorter chains just skip each ball out of view, finding the ones in view costs more
+DRAW_CULL_MIN_BALLS = 64
+
 
 @dataclass
 class BallRecord:
     ball: ChainBall
     target_id: int
 
+    def reset(self, ball: ChainBall, target_id: int):
+        self.ball = ball
+        self.target_id = target_id
+
 @dataclass
 class InsertionRecord:
     index: int
@@ -29,64 +49,79 @@ class CollisionRecord:
     ball: Ball
     other: ShotBall | ChainCollisionRecord
 
-append_id = 1
-chain_id = 1
-
 class Chain(Entity):
-    def __init__(self, path: Path, entries: list[ChainBall | BallRecord]):
+    def __init__(self, path: Path, entries: list[ChainBall | BallRecord] | BlockList,
+                 runs: ColorRuns | None = None, pools=None, ids: IdAllocator | None = None,
+                 events: EventBus | None = None):
         super().__init__()
-        global chain_id
-        self.id = chain_id
-        chain_id += 1
+        # Chain ids come from the game that owns the chain
+        self.ids = ids if ids is not None else IdAllocator()
+        self.id = self.ids.allocate()
         
         self.path = path
+        # zooma.utils.pool.BallPools to take records from and give removed balls back to
+        self.pools = pools
+        # The game's zooma.utils.events.EventBus, told about every change to the balls
+        self.events = events
         
-        self.data: list[BallRecord] = []
         # TODO: playtest for speed
         self.move_speed = 0
 
-        # Create record for each ball
-        for entry in entries:
-            if isinstance(entry, ChainBall):
-                id = len(self.data)
-                new_ball = entry.with_id(id).with_chain_id(self.id)
-                record = BallRecord(new_ball, 0)
-            elif isinstance(entry, BallRecord):
-                record = entry
+        if isinstance(entries, BlockList):
+            # Records handed over from another chain, e.g. by split
+            for record in entries:
                 record.ball.with_chain_id(self.id)
-            self.data.append(record)
+            self.data = entries
+        else:
+            # Create record for each ball
+            records = []
+            for entry in entries:
+                if isinstance(entry, ChainBall):
+                    id = len(records)
+                    new_ball = entry.with_id(id).with_chain_id(self.id)
+                    record = self._make_record(new_ball, 0)
+                elif isinstance(entry, BallRecord):
+                    record = entry
+                    record.ball.with_chain_id(self.id)
+                records.append(record)
+            self.data: BlockList = BlockList(records)
 
         if len(self.data) == 0:
-            print("!!!! Warning made empty chain !!!!")
+            log.warning("Made empty chain %d", self.id)
+
+        # Colors of the balls as runs of color ids, kept in step with self.data
+        if runs is None:
+            runs = ColorRuns([get_color_id(record.ball.color) for record in self.data])
+        self.runs = runs
 
         self.pending_insertions: list[InsertionRecord] = []
 
+        self._publish(CHAIN_CREATED, self)
+
     def __len__(self):
         return len(self.data)
+
+    def _make_record(self, ball: ChainBall, target_id: int) -> BallRecord:
+        if self.pools is None:
+            return BallRecord(ball, target_id)
+        return self.pools.records.acquire(ball, target_id)
+
+    def _publish(self, event: str, *args):
+        if self.events is not None:
+            self.events.publish(event, *args)
+
+    def _release(self, records: list[BallRecord]):
+        if self.pools is not None:
+            for record in records:
+                self.pools.release_record(record)
     
     def check_collision(self, entity: Entity) -> CollisionRecord | None:
 
+        # Chains touching each other are found from path offsets, see touches()
         if isinstance(entity, Ball):
             for i, record in enumerate(self.data):
                 if record.ball.check_collision(entity):
                     return CollisionRecord(i, record.ball, entity)
-        elif isinstance(entity, Chain):
-            if self.path != entity.path:
-                return None
-
-            other_first = entity.data[0].ball
-            other_last = entity.data[-1].ball
-            my_first = self.data[0].ball
-            my_last = self.data[-1].ball
-
-            if my_first.check_collision(other_last):
-                if not (hasattr(entity, 'shut_the_fuck_up') or hasattr(self, 'shut_the_fuck_up')):
-                    print("Collision between chains", self.id, entity.id)
-                return CollisionRecord(0, my_first, ChainCollisionRecord(len(entity.data) - 1, other_last))
-            elif my_last.check_collision(other_first):
-                if not (hasattr(entity, 'shut_the_fuck_up') or hasattr(self, 'shut_the_fuck_up')):
-                    print("Collision between chains", self.id, entity.id)
-                return CollisionRecord(len(self.data) - 1, my_last, ChainCollisionRecord(0, other_first))
                 
         return None
 
@@ -104,20 +139,49 @@ class Chain(Entity):
             return None
         return self.data[index].ball
 
+    def get_offset(self, index: int) -> float:
+        """ Distance along the path to the ball at index """
+        record = self.data[index]
+        return self.path.get_offset(record.ball.position, record.target_id)
+
+    def find_offset(self, offset: float) -> int:
+        """ Index of the first ball at most offset along the path, len(self) if there is none """
+        low, high = 0, len(self.data)
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_offset(middle) > offset:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_head_offset(self) -> float:
+        """ Offset of the front ball, the one closest to the death hole """
+        return self.get_offset(0)
+
+    def get_tail_offset(self) -> float:
+        return self.get_offset(len(self.data) - 1)
+
+    def touches(self, behind: "Chain") -> bool:
+        """ Whether chain behind has caught up with the end of this chain """
+        gap = self.get_tail_offset() - behind.get_head_offset()
+        return gap < self.get_last_ball().radius + behind.get_first_ball().radius
+
     def split(self, index: int) -> "Chain":
         if (index >= len(self.data)):
-            print(f"Cannot split chain at index {index} because chain has {len(self.data)} balls")
+            log.debug("Cannot split chain at index %d because chain has %d balls", index, len(self.data))
             return None
         
-        print("Splitting chain at index", index)
-        print("Chain Before: ", [record.ball.id for record in self.data])
-        new_records = self.data[index:]
+        log.debug("Splitting chain at index %d", index)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Chain Before: %s", [record.ball.id for record in self.data])
+        new_records = self.data.split(index)
 
         if len(new_records) == 0:
             return None
 
-        new_chain = Chain(self.path, new_records)
-        self.data = self.data[:index]
+        new_chain = Chain(self.path, new_records, self.runs.split(index), self.pools, self.ids, self.events)
+        self._publish(CHAIN_SPLIT, self, new_chain)
 
         return new_chain
         
@@ -132,35 +196,23 @@ class Chain(Entity):
         if not collision_record:
             return None
 
-        
+        return self.get_insertion_point_at(collision_record.index, ball.position)
 
-        closest_distance = float('inf')
-        path_segment_vector = None
-        
-        #for each path segment, we need to check if its the nearest segment to the ball
-        for i in range(len(self.path.points) - 1):
-            a = self.path.points[i]
-            b = self.path.points[i + 1]
-            ab = b - a
-            ap = ball.position - a
-            #dot product of ap and ab but cap it at 0 and 1
-            #constrains point to one path segment
-            t = max(0, min(1, ap.dot(ab) / ab.length_squared()))
-            point = a + ab * t
-            distance = get_distance_between(ball.position, point)
-            if distance < closest_distance:
-                closest_distance = distance
-                path_segment_vector = ab
+    def get_insertion_point_at(self, index: int, position: Vector2) -> InsertionRecord:
+        """ Insertion point for a ball at position touching the ball at index """
+        segment_index, _, _ = self.path.get_nearest_segment(position)
 
         # Shouldn't happen
-        if path_segment_vector is None:
-            return InsertionRecord(collision_record.index, 0)
+        if segment_index < 0:
+            return InsertionRecord(index, 0)
+
+        path_segment_vector = self.path.points[segment_index + 1] - self.path.points[segment_index]
         
-        impact_vector = (collision_record.ball.position - ball.position)
+        impact_vector = (self.data[index].ball.position - position)
         alignment = impact_vector.dot(path_segment_vector)
 
         if_after = alignment > 0
-        insertion_index = collision_record.index + (1 if if_after else 0)
+        insertion_index = index + (1 if if_after else 0)
 
         target_id = self._compute_target_id(insertion_index)
 
@@ -175,22 +227,48 @@ class Chain(Entity):
     def insert_ball(self, ball: ChainBall, insertion_record: InsertionRecord):
         id = 0
         ball = ball.with_id(id).with_chain_id(self.id)
-        new_record = BallRecord(ball, insertion_record.target_id)
+        new_record = self._make_record(ball, insertion_record.target_id)
         self.data.insert(insertion_record.index, new_record)
+        self.runs.insert(insertion_record.index, get_color_id(ball.color))
         self.pending_insertions.append(insertion_record)
+        self._publish(BALLS_ADDED, self, 1)
 
     def append_chain(self, chain: "Chain"):
-        global append_id
-        append_id += 1
         last_ball = self.get_last_ball()
         last_ball_id = last_ball.id if last_ball else 0
         for record in chain.data:
             ball_id = last_ball_id + 1
             record.ball.with_id(ball_id).with_chain_id(self.id)
-            self.data.append(record)
+        # Hands over whole blocks, chain is left empty
+        self.data.concat(chain.data)
+        self.runs.extend(chain.runs)
+        self._publish(CHAIN_MERGED, self, chain)
+
+    def append_ball(self, ball: ChainBall):
+        """ Add a single ball to the end, same as appending a one ball chain """
+        last_ball = self.get_last_ball()
+        last_ball_id = last_ball.id if last_ball else 0
+        ball.with_id(last_ball_id + 1).with_chain_id(self.id)
+        self.data.append(self._make_record(ball, 0))
+        self.runs.append(get_color_id(ball.color))
+        self._publish(BALLS_ADDED, self, 1)
 
     def remove_ball(self, index: int):
-        self.data.pop(index)
+        self.remove_balls(index, 1)
+
+    def remove_balls(self, start: int, count: int):
+        """ Remove count balls starting at index start """
+        removed = self.data[start:start + count]
+        del self.data[start:start + count]
+        self.runs.remove(start, count)
+        self._release(removed)
+        self._publish(BALLS_REMOVED, self, len(removed))
+        if len(self.data) == 0:
+            self._publish(CHAIN_EMPTIED, self)
+
+    def get_match(self, index: int, color) -> tuple[int, int]:
+        """ (start, count) of balls of color touching an insertion at index """
+        return self.runs.match_at(index, get_color_id(color))
 
     def reverse(self, speed: float):
         self.move_speed = -speed
@@ -201,9 +279,30 @@ class Chain(Entity):
     def is_reversed(self):
         return self.move_speed < 0
     
-    def draw(self, screen):
-        for record in self.data:
-            record.ball.draw(screen)
+    def draw(self, screen, camera: Camera | None = None):
+        if camera is None or camera.shows_whole_world() or len(self.data) < DRAW_CULL_MIN_BALLS:
+            for record in self.data:
+                record.ball.draw(screen, camera)
+            return
+
+        # Each run of path segments in view is a range of path offsets.
+        # Balls are ordered along the path, so the balls in that range are
+        # found by bisection and balls out of view are never looked at. The
+        # range is widened since balls being pushed apart can overlap.
+        radius = self.data[0].ball.radius
+        margin = radius * DRAW_MARGIN_BALLS
+        segments = self.path.get_segments_in_rect(*camera.get_view_rect(radius))
+        run_start = None
+        for i, segment in enumerate(segments):
+            if run_start is None:
+                run_start = segment
+            if i + 1 < len(segments) and segments[i + 1] == segment + 1:
+                continue
+            start = self.find_offset(self.path.get_point_offset(segment + 1) + margin)
+            end = self.find_offset(self.path.get_point_offset(run_start) - margin)
+            for record in self.data[start:end]:
+                record.ball.draw(screen, camera)
+            run_start = None
 
     def _is_pushed_by_insertion_record(self, index: int) -> bool:
         for record in self.pending_insertions:
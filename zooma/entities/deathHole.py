@@ -1,26 +1,63 @@
 from pygame import Vector2
-import pygame
 from zooma.entities.entity import Entity
 from zooma.entities.chain import Chain
+from zooma.entities.path import Path
+from zooma.utils.camera import Camera, draw_circle
+from zooma.utils.events import EventBus, HOLE_REACHED
+from zooma.utils.log import get_logger
+
+log = get_logger(__name__)
 
 
 class DeathHole(Entity):
-    def __init__(self, position: Vector2):
+    def __init__(self, position: Vector2, path: Path | None = None, events: EventBus | None = None):
         super().__init__()
         self.position = Vector2(position)
+        # Path ending in this hole
+        self.path = path
         self.death_radius = 5
+        self.events = events
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, (255, 0, 0), self.position, 20)
-        pygame.draw.circle(screen, (0, 0, 0), self.position, 18)
-        pygame.draw.circle(screen, (255, 0, 0), self.position, self.death_radius)
+    def draw(self, screen, camera: Camera | None = None):
+        if camera is not None and not camera.is_visible(self.position, 20):
+            return
+        draw_circle(screen, camera, (255, 0, 0), self.position, 20)
+        draw_circle(screen, camera, (0, 0, 0), self.position, 18)
+        draw_circle(screen, camera, (255, 0, 0), self.position, self.death_radius)
 
 
     def check_collision(self, other: Chain):
         if len(other) == 0:
-            print("!!!! Warning found empty chain !!!!")
+            log.warning("Found empty chain %d", other.id)
             return False
             
         first_ball = other.get_first_ball()
         distance = self.position.distance_to(first_ball.position)
-        return distance < self.death_radius
\ No newline at end of file
+        return distance < self.death_radius
+
+    def count_consumed(self, other: Chain) -> int:
+        """ Number of balls at the front of the chain that reached the hole """
+        if len(other) == 0:
+            log.warning("Found empty chain %d", other.id)
+            return 0
+
+        if self.path is None:
+            return 1 if self.check_collision(other) else 0
+
+        # Balls are ordered along the path, so stop at the first one still out
+        end = self.path.get_length() - self.death_radius
+        count = 0
+        while count < len(other) and other.get_offset(count) > end:
+            count += 1
+        return count
+
+    def consume(self, other: Chain) -> int:
+        """ Remove the balls that reached the hole from the front of the chain """
+        count = self.count_consumed(other)
+        if count == 0:
+            return 0
+
+        other.remove_balls(0, count)
+        if self.events is not None:
+            self.events.publish(HOLE_REACHED, self, other, count)
+        return count
@@ -1,34 +1,55 @@
 from pygame import Vector2, Color
-import pygame
 
 from zooma.entities.entity import Entity
 from zooma.entities.chain import Chain
 from zooma.entities.path import Path
+from zooma.utils.camera import Camera, draw_circle
 from zooma.utils.colors import LevelColors
+from zooma.utils.events import EventBus, EMITTER_STARTED, EMITTER_STOPPED
 
 class Emitter (Entity):
-    def __init__(self, position: Vector2, path: Path, level_colors: LevelColors):
+    def __init__(self, position: Vector2, path: Path, level_colors: LevelColors,
+                 events: EventBus | None = None, ball_limit: int | None = None):
         super().__init__()
         self.position = Vector2(position)
         self.path = path
         self.level_colors = level_colors
-        self.color_generator = self.level_colors.get_color_generator()
+        self.color_sequence = self.level_colors.get_color_sequence()
         self.active = False
+        self.events = events
+        # Balls to send before stopping for good, None keeps going until the level stops it
+        self.ball_limit = ball_limit
+        self.emitted = 0
 
     def activate(self):
         self.active = True
+        if self.events is not None:
+            self.events.publish(EMITTER_STARTED, self)
 
     def deactivate(self):
         self.active = False
+        if self.events is not None:
+            self.events.publish(EMITTER_STOPPED, self)
 
     def is_active(self):
         return self.active
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, (255, 255, 255), self.position, 20)
+    def count_emitted(self):
+        """ Count a ball sent out, stopping at the ball limit """
+        self.emitted += 1
+        if self.is_exhausted():
+            self.deactivate()
+
+    def is_exhausted(self) -> bool:
+        return self.ball_limit is not None and self.emitted >= self.ball_limit
+
+    def draw(self, screen, camera: Camera | None = None):
+        if camera is not None and not camera.is_visible(self.position, 20):
+            return
+        draw_circle(screen, camera, (255, 255, 255), self.position, 20)
 
     def get_color(self):
-        return next(self.color_generator)
+        return self.color_sequence.next_color()
         
     def check_collision(self, other: Chain):
         last_ball = other.get_last_ball()
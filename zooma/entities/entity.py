@@ -13,6 +13,6 @@ class Entity(ABC):
         pass
     
     @abstractmethod
-    def draw(self, screen):
-        """ Draw the entity on the screen """
+    def draw(self, screen, camera=None):
+        """ Draw the entity on the screen, through a zooma.utils.camera.Camera if given """
         pass
\ No newline at end of file
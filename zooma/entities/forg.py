@@ -4,17 +4,25 @@ import math
 
 from zooma.entities.entity import Entity
 from zooma.entities.ball import Ball, ShotBall, HeldBall
+from zooma.utils.camera import Camera, draw_circle
 from zooma.utils.colors import LevelColors
 
 SHOOT_COOLDOWN = 500  # in ms
 DEATH_ANIMATION_TIME = 3000
+# Loaded balls are each a random color, repeats allowed
+LOAD_CLUSTER_SIZES = (1,)
 
 class Forg(Entity):
-    def __init__(self, position: Vector2, colors: LevelColors):
+    def __init__(self, position: Vector2, colors: LevelColors, clock=pygame.time.get_ticks, pools=None):
         super().__init__()
+        # Callable returning the current time in ms, swapped out for headless runs
+        self.clock = clock
+        # zooma.utils.pool.BallPools for shot and held balls, None allocates new ones
+        self.pools = pools
         self.position = position
         self.color = Color('DarkOliveGreen')
         self.level_colors = colors
+        self.color_sequence = colors.get_color_sequence(LOAD_CLUSTER_SIZES, avoid_repeats=False)
         
         self.held_ball: Ball | None = None
         self.reserve_ball: Ball | None = None
@@ -39,15 +47,24 @@ class Forg(Entity):
     def swap_ball(self):
         self.held_ball, self.reserve_ball = self.reserve_ball, self.held_ball
 
+    def can_shoot(self) -> bool:
+        if self.is_dead or self.held_ball is None:
+            return False
+        return self.clock() - self.last_shot_time >= SHOOT_COOLDOWN
+
     def shoot(self):
         if self.is_dead:
             return None
         
-        current_time = pygame.time.get_ticks()
-        if self.held_ball is None or current_time - self.last_shot_time < SHOOT_COOLDOWN:
+        if not self.can_shoot():
             return None
+        current_time = self.clock()
         
-        shot_ball = ShotBall(self._get_held_position(), self.held_ball.color)
+        if self.pools is None:
+            shot_ball = ShotBall(self._get_held_position(), self.held_ball.color)
+        else:
+            shot_ball = self.pools.shot_balls.acquire(self._get_held_position(), self.held_ball.color)
+            self.pools.held_balls.release(self.held_ball)
         shot_ball.set_heading(self.heading)
 
         self.held_ball = None
@@ -57,18 +74,24 @@ class Forg(Entity):
 
     def die(self):
         self.is_dead = True
-        self.time_of_death = pygame.time.get_ticks()
+        self.time_of_death = self.clock()
 
     def reset(self):
         self.is_dead = False
         self.time_of_death = 0
 
+    def replace_color(self, color: Color):
+        """ Reload held and reserve balls of a color that is no longer in play """
+        for ball in (self.reserve_ball, self.held_ball):
+            if ball is not None and ball.color == color:
+                ball.color = self.color_sequence.next_color()
+
     def update(self):
         if self.is_dead:
             # get angle from heading
             angle = math.degrees(math.atan2(self.heading.y, self.heading.x))
             spin_rate = 1440 / 60
-            elapsed_time = pygame.time.get_ticks() - self.time_of_death
+            elapsed_time = self.clock() - self.time_of_death
             animation_progress = min(1, elapsed_time / DEATH_ANIMATION_TIME)
             easing_progress = (1 - (1 - animation_progress) ** 3)
             angle += max(0, spin_rate - (spin_rate * easing_progress))
@@ -78,24 +101,24 @@ class Forg(Entity):
         if self.held_ball is None and self.reserve_ball is not None:
             self.swap_ball()
         
-        current_time = pygame.time.get_ticks()
+        current_time = self.clock()
         if self.reserve_ball is None:
-            self.reserve_ball = HeldBall(self.level_colors.get_color())
-
-        if not self.level_colors.is_valid_color(self.reserve_ball.color):
-            self.reserve_ball.color = self.level_colors.get_color()
-
-        if self.held_ball is not None and not self.level_colors.is_valid_color(self.held_ball.color):
-            self.held_ball.color = self.level_colors.get_color()
+            color = self.color_sequence.next_color()
+            if self.pools is None:
+                self.reserve_ball = HeldBall(color)
+            else:
+                self.reserve_ball = self.pools.held_balls.acquire(color)
         
-    def draw(self, screen):
-        pygame.draw.circle(screen, self.color, self.position, self.radius)
+    def draw(self, screen, camera: Camera | None = None):
+        if camera is not None and not camera.is_visible(self.position, self.radius * 2):
+            return
+        draw_circle(screen, camera, self.color, self.position, self.radius)
         
         if self.held_ball:
             self.held_ball.position = self._get_held_position()
-            self.held_ball.draw(screen)
+            self.held_ball.draw(screen, camera)
 
         if self.reserve_ball:
-            pygame.draw.circle(screen, self.reserve_ball.color, self.position, 8)
+            draw_circle(screen, camera, self.reserve_ball.color, self.position, 8)
             
         
\ No newline at end of file
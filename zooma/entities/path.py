@@ -1,12 +1,22 @@
 from pygame import Vector2
 import pygame
 from zooma.entities.entity import Entity
+from zooma.utils.spatial_grid import SpatialGrid
+from zooma.utils.camera import Camera, draw_line
+
+SEGMENT_CELL_SIZE = 25
+# Cells of the grid used to find what's on screen, a view only covers a few of them
+VIEW_CELL_SIZE = 200
 
 
 class Path(Entity):
     def __init__(self, init_points: list[tuple[float, float]]):
         super().__init__()
         self.points = []
+        self.segment_grid: SpatialGrid | None = None
+        self.view_grid: SpatialGrid | None = None
+        # Distance along the path to each point, built on first use
+        self.cumulative_lengths: list[float] | None = None
         for point in init_points:
             self.addPoint(point)
 
@@ -16,23 +26,89 @@ class Path(Entity):
 
         if is_empty or (self.points[-1].distance_to(new_point) > 5):
             self.points.append(new_point)
+            self.segment_grid = None
+            self.view_grid = None
+            self.cumulative_lengths = None
 
     def clear(self):
         self.points = []
+        self.segment_grid = None
+        self.view_grid = None
+        self.cumulative_lengths = None
 
-    def distance_between_point_and_position(self, goal_id: int, position: Vector2) -> float:
+    def truncate(self, length: int):
+        """ Drop every point from index length onwards """
+        del self.points[length:]
+        self.segment_grid = None
+        self.view_grid = None
+        self.cumulative_lengths = None
+
+    def _get_cumulative_lengths(self) -> list[float]:
+        if self.cumulative_lengths is None:
+            lengths = []
+            total = 0
+            previous = None
+            for point in self.points:
+                if previous is not None:
+                    total += previous.distance_to(point)
+                lengths.append(total)
+                previous = point
+            self.cumulative_lengths = lengths
+        return self.cumulative_lengths
+
+    def get_length(self) -> float:
+        lengths = self._get_cumulative_lengths()
+        return lengths[-1] if lengths else 0
+
+    def get_point_offset(self, index: int) -> float:
+        """ Distance along the path to point index """
+        return self._get_cumulative_lengths()[index]
+
+    def get_offset(self, position: Vector2, target_id: int) -> float:
         """
-        Return the distance between some position near a path segment and a 
-        point (index) on the path segment.
+        Distance along the path to a ball at position that is moving to or
+        from point target_id. Only the two segments touching that point are
+        looked at, so parts of the path that cross or pass close by can't
+        be mistaken for where the ball is.
         """
-        goal_id = goal_id % len(self.points)
+        if len(self.points) < 2:
+            return 0
+        lengths = self._get_cumulative_lengths()
 
-        segment_point_start = 0
-        segment_point_end = 0
+        best_offset = 0
         closest_distance = float('inf')
-        projected_point = Vector2(0, 0)
+        for start in (target_id - 1, target_id):
+            start = max(0, min(start, len(self.points) - 2))
+            a = self.points[start]
+            ab = self.points[start + 1] - a
+            length_squared = ab.length_squared()
+            t = 0 if length_squared == 0 else max(0, min(1, (position - a).dot(ab) / length_squared))
+            distance = (a + ab * t).distance_to(position)
+            if distance < closest_distance:
+                closest_distance = distance
+                best_offset = lengths[start] + t * (lengths[start + 1] - lengths[start])
+        return best_offset
 
+    def _build_segment_grid(self, cell_size: float = SEGMENT_CELL_SIZE) -> SpatialGrid:
+        grid = SpatialGrid(cell_size)
         for i in range(len(self.points) - 1):
+            a = self.points[i]
+            b = self.points[i + 1]
+            grid.insert(i, min(a.x, b.x), min(a.y, b.y), max(a.x, b.x), max(a.y, b.y))
+        return grid
+
+    def get_segments_in_rect(self, min_x: float, min_y: float, max_x: float, max_y: float) -> list[int]:
+        """ Start index of every segment that may overlap the rectangle, in path order """
+        if self.view_grid is None:
+            self.view_grid = self._build_segment_grid(VIEW_CELL_SIZE)
+        return sorted(self.view_grid.query_rect(min_x, min_y, max_x, max_y))
+
+    def _project_onto_segments(self, position: Vector2, indices) -> tuple[int, Vector2, float]:
+        best_index = -1
+        closest_distance = float('inf')
+        projected_point = Vector2(0, 0)
+
+        for i in indices:
             a = self.points[i]
             b = self.points[i + 1]
             ab = b - a
@@ -43,10 +119,45 @@ class Path(Entity):
             if distance < closest_distance:
                 closest_distance = distance
                 projected_point = point
-                segment_point_start = i
-                segment_point_end = i + 1
-                
-        
+                best_index = i
+
+        return best_index, projected_point, closest_distance
+
+    def get_nearest_segment(self, position: Vector2) -> tuple[int, Vector2, float]:
+        """
+        Return (segment start index, projected point, distance) for the path 
+        segment closest to position. Ties go to the lowest segment index.
+        """
+        if self.segment_grid is None:
+            self.segment_grid = self._build_segment_grid()
+
+        # Any segment within radius is guaranteed to be in the queried cells,
+        # so widen the search until something that close turns up
+        radius = SEGMENT_CELL_SIZE / 2
+        for _ in range(5):
+            candidates = self.segment_grid.query_rect(position.x - radius, position.y - radius,
+                                                      position.x + radius, position.y + radius)
+            if candidates:
+                result = self._project_onto_segments(position, sorted(candidates))
+                if result[2] <= radius:
+                    return result
+            radius *= 2
+
+        return self._project_onto_segments(position, range(len(self.points) - 1))
+
+    def distance_between_point_and_position(self, goal_id: int, position: Vector2) -> float:
+        """
+        Return the distance between some position near a path segment and a 
+        point (index) on the path segment.
+        """
+        goal_id = goal_id % len(self.points)
+
+        segment_point_start, projected_point, _ = self.get_nearest_segment(position)
+        segment_point_start = max(segment_point_start, 0)
+        segment_point_end = segment_point_start + 1
+        if len(self.points) < 2:
+            segment_point_end = 0
+
         if goal_id <= segment_point_start:
             segment_point_id = segment_point_start
         else:
@@ -77,6 +188,11 @@ class Path(Entity):
             index = (index + 1) % len(self.points)
         return path_length
 
-    def draw(self, screen):
-        for i in range(len(self.points)-1):
-            pygame.draw.line(screen, (255,255,255), self.points[i], self.points[i+1], 1)
\ No newline at end of file
+    def draw(self, screen, camera: Camera | None = None):
+        if camera is None or camera.shows_whole_world():
+            segments = range(len(self.points) - 1)
+        else:
+            # Only what the grid has in view, the rest of the path costs nothing
+            segments = self.get_segments_in_rect(*camera.get_view_rect())
+        for i in segments:
+            draw_line(screen, camera, (255,255,255), self.points[i], self.points[i+1], 1)
\ No newline at end of file
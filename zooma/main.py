@@ -2,6 +2,8 @@ import json
 import pygame
 import random
 import sys
+import time
+from collections import deque
 from pygame.locals import *
 
 from pygame import Vector2
@@ -12,14 +14,40 @@ from zooma.entities.path import Path
 from zooma.entities.chain import Chain
 from zooma.entities.emitter import Emitter
 from zooma.entities.deathHole import DeathHole
-from zooma.utils.colors import LevelColors
+from zooma.utils.colors import LevelColors, get_color_by_id, get_color_id
 from zooma.entities.forg import Forg
-
-WIDTH, HEIGHT = 1000, 800
+from zooma.utils.path_compiler import compile_path, DEFAULT_TOLERANCE
+from zooma.utils.level_validation import get_compiled_filename, get_source_hash
+from zooma.utils.log import get_logger, configure_from_env
+from zooma.utils.pool import BallPools
+from zooma.utils.ids import IdAllocator
+from zooma.utils.numeric import Quantizer, FLOAT64
+from zooma.utils.events import (EventBus, TaskScheduler, CHAIN_CREATED, BALLS_ADDED, BALLS_REMOVED,
+                                CHAIN_EMPTIED, CHAIN_SPLIT, CHAIN_MERGED, EMITTER_STARTED, EMITTER_STOPPED,
+                                HOLE_REACHED, PROGRESS_COMPLETE, COLOR_EXHAUSTED, GAME_OVER)
+from zooma.audio import SoundManager
+from zooma.utils.pacing import FramePacer, LatencyTracker
+from zooma.utils.camera import (Camera, SCREEN_WIDTH, SCREEN_HEIGHT, SCROLL_SPEED, ZOOM_STEP, get_world_size,
+                                draw_circle, draw_line)
+
+log = get_logger(__name__)
+
+WIDTH, HEIGHT = SCREEN_WIDTH, SCREEN_HEIGHT
+# Max distance in px between a level's drawn path and the compiled path used in game
+PATH_TOLERANCE = DEFAULT_TOLERANCE
+# Keep one snapshot per second for the last REWIND_SECONDS to rewind with backspace
+REWIND_SECONDS = 30
+# Level list, the maps in it are relative to zooma/levels
+LEVELS_FILE = "zooma/levels/levels.json"
 
 
 class ZoomaGameState:
-    def __init__(self):
+    def __init__(self, seed: int | None = None):
+        # Everything random in a game comes from its own generator, so games
+        # running side by side don't affect each other
+        self.rng = random.Random(seed)
+        self.chain_ids = IdAllocator()
+
         self.current_level = 0
         self.level_name = ""
         self.score = 0
@@ -29,9 +57,17 @@ class ZoomaGameState:
 
         self.entity_list = []
         self.forg: Forg = None
+        # Size of the level, shots leaving it are gone, see zooma.utils.camera
+        self.world_size = (WIDTH, HEIGHT)
+        # Reused ball objects, see zooma.utils.pool
+        self.pools = BallPools()
+        # What changed this tick, and the tasks that run when it does, see zooma.utils.events
+        self.events = EventBus()
+        self.tasks = TaskScheduler(self.events)
 
         self.paused = True
         self.draw_mode = False
+        self.show_aim_guide = False
         self.last_message = ""
         self.base_chain_speed = 0.5
         self.did_zooma = False
@@ -44,31 +80,73 @@ class ZoomaGameState:
         self.game_start_boost_time = 1500
 
         self.difficulty = 6
-        self.level_colors: LevelColors = LevelColors(self.difficulty)
-
+        self.level_colors: LevelColors = LevelColors(self.difficulty, rng=self.rng)
 
-class ZoomaGame:
-    def __init__(self):
-        """ Initialize game state"""
-
-        pygame.init()
-        pygame.font.init() #initialize the font module
-        pygame.mixer.init()
 
-        pygame.display.set_caption("Zooma (not quite deluxe)") #set the title of the window
+TICK_RATE = 120
 
-        # Set up the display
-        self.screen = pygame.display.set_mode((WIDTH, HEIGHT)) #set the dimensions of the window
-        #create a clock object to control the frame rate
-        self.clock = pygame.time.Clock() 
 
-        self.font = pygame.font.Font(None, 36) #set the font for the text
+class ZoomaGame:
+    def __init__(self, headless: bool = False, numeric_mode: str = FLOAT64, seed: int | None = None):
+        """ Initialize game state
+
+        A headless game opens no window and plays no sound. Its clock advances
+        by one fixed tick per call to tick() so bots and batch runs can step
+        the simulation as fast as they like.
+
+        numeric_mode is one of zooma.utils.numeric.NUMERIC_MODES, "float32" or
+        "fixed" round positions every tick, see that module for what this
+        does and doesn't guarantee. seed seeds the game's random number
+        generator.
+        """
+        self.headless = headless
+        self.seed = seed
+        self.numeric = Quantizer(numeric_mode)
+        self.sim_time = 0
+        # Windowed games keep real time from here, the SDL timer is never initialized
+        self.start_ns = time.perf_counter_ns()
+        self.screen = None
+        # Sound effects load in the background, the font on first use
+        self.sounds: SoundManager | None = None
+        self.font = None
+        # Which part of the level is on screen
+        self.camera = Camera((WIDTH, HEIGHT))
+        # Video of the session, see zooma.capture
+        self.capture = None
+
+        if not headless:
+            # Only the display and fonts, the sound manager starts the mixer
+            pygame.display.init()
+            pygame.font.init()
+            self.sounds = SoundManager()
+            self.sounds.start()
+
+            pygame.display.set_caption("Zooma (not quite deluxe)") #set the title of the window
+
+            # Set up the display
+            self.screen = pygame.display.set_mode((WIDTH, HEIGHT)) #set the dimensions of the window
+            from zooma.capture import capture_from_env
+            self.capture = capture_from_env((WIDTH, HEIGHT))
+
+        # Holds the game loop to TICK_RATE and measures how steady it is
+        self.pacer = FramePacer(TICK_RATE)
+        # Time from polling an input to the flip showing it
+        self.latency = LatencyTracker()
 
-        self.zooma_sound = pygame.mixer.Sound("zooma/sounds/zooma.wav")
         self.data = None
 
         self.state: ZoomaGameState = None
-        
+
+        self.quick_save = None
+        self.rewind_snapshots = deque(maxlen=REWIND_SECONDS)
+        self.last_rewind_snapshot = 0
+
+    def get_ticks(self) -> int:
+        """ Current game time in ms, simulated when headless, since the game was created otherwise """
+        if self.headless:
+            return int(self.sim_time)
+        return (time.perf_counter_ns() - self.start_ns) // 1_000_000
+
 
     def run(self):
         """ Run the game loop """
@@ -79,32 +157,70 @@ class ZoomaGame:
 
         self.start_level(self.state)
 
+        frame = 0
         while True:
             self.process_inputs(self.state)
 
-            self.do_tasks(self.state)
+            self.tick(self.state)
 
-            self.update_entities(self.state)
+            self.record_rewind_snapshot(self.state)
 
             self.update_display(self.state)
-
-            # Currently capped at 120fps
-            self.clock.tick(120) 
-
-    def init_game(self):
-        with open("zooma/levels/levels.json", "r") as f:
+            if self.capture is not None:
+                # The loop runs at TICK_RATE, the video at the capture's fps
+                frame += 1
+                if frame % max(1, TICK_RATE // self.capture.fps) == 0:
+                    self.capture.capture(self.screen)
+
+            self.pacer.wait()
+
+    def tick(self, state: ZoomaGameState):
+        """ Advance the simulation by one frame """
+        self.do_tasks(state)
+        self.update_entities(state)
+        if not self.numeric.is_exact():
+            self.quantize_entities(state)
+
+        if self.headless:
+            self.sim_time += 1000 / TICK_RATE
+
+    def quantize_entities(self, state: ZoomaGameState):
+        """ Round everything that moves to the game's numeric mode """
+        vector = self.numeric.vector
+        for entity in state.entity_list:
+            if isinstance(entity, Chain):
+                for record in entity.data:
+                    vector(record.ball.position)
+            elif isinstance(entity, ShotBall):
+                vector(entity.position)
+                vector(entity.heading)
+        if state.forg is not None:
+            vector(state.forg.heading)
+
+    def init_game(self, levels_file: str = LEVELS_FILE):
+        with open(levels_file, "r") as f:
             data = json.load(f)
 
         self.data = data
 
-        self.state = ZoomaGameState()
+        self.state = ZoomaGameState(self.seed)
+        self.schedule_tasks(self.state)
         
     def load_level(self, level: int, state: ZoomaGameState) -> ZoomaGameState:
         try:
             level_data = self.data["levels"][level]
 
+            # Read the map before touching state, so a bad level leaves the current one alone
+            map_name = level_data["map"]
+            with open(f"zooma/levels/{map_name}", "r") as f:
+                map_data = json.load(f)
+
+            if "turret" not in map_data:
+                log.error("Level map %s has no turret", map_name)
+                return None
+
             state.difficulty = level_data["difficulty"]
-            state.level_colors = LevelColors(state.difficulty)
+            state.level_colors = LevelColors(state.difficulty, rng=state.rng)
 
             state.level_name = level_data["name"]
             
@@ -122,40 +238,63 @@ class ZoomaGame:
             state.entity_list.clear()
 
             # Load Level Entities
-            map_name = level_data["map"]
-            with open(f"zooma/levels/{map_name}", "r") as f:
-                map_data = json.load(f)
+            state.world_size = get_world_size(map_data)
+            compiled_paths = self.load_compiled_paths(f"zooma/levels/{map_name}", map_data)
 
-            for path_obj in map_data["paths"]:
+            for i, path_obj in enumerate(map_data["paths"]):
                 points = path_obj["points"]
                 if len(points) < 2:
-                    print("Level map has invalid path")
+                    log.warning("Level map has invalid path")
                     continue
 
-                path = Path(points)
+                if compiled_paths is not None:
+                    path = Path(self.numeric.points(compiled_paths[i]["points"]))
+                else:
+                    path = Path(self.numeric.points(compile_path(points, PATH_TOLERANCE)))
                 state.entity_list.append(path)
 
                 start_point = points[0]
                 end_point = points[-1]
                 
-                emitter = Emitter(Vector2(start_point), path, state.level_colors)
+                emitter = Emitter(Vector2(start_point), path, state.level_colors, state.events,
+                                  ball_limit=level_data.get("chain_length"))
                 state.entity_list.append(emitter)
 
-                death_hole = DeathHole(Vector2(end_point))
+                death_hole = DeathHole(Vector2(end_point), path, state.events)
                 state.entity_list.append(death_hole)
 
             forg_data = map_data["turret"]
-            forg = Forg(Vector2(forg_data["position"]), state.level_colors)
+            forg = Forg(Vector2(forg_data["position"]), state.level_colors, clock=self.get_ticks,
+                        pools=state.pools)
             state.forg = forg
             state.entity_list.append(forg)
+            self.camera.set_world_size(state.world_size)
+            self.camera.center_on(forg.position)
+            state.tasks.wake_all()
         except Exception as e:
-            print(f"Failed to load level {level}: {e}")
+            log.error("Failed to load level %s: %s", level, e)
             return None
         
         return state
     
+    def load_compiled_paths(self, filename: str, map_data: dict) -> list | None:
+        """ Paths precompiled by the editor, if they exist and match this map """
+        try:
+            with open(get_compiled_filename(filename), "r") as f:
+                compiled = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (compiled.get("tolerance") != PATH_TOLERANCE or
+                len(compiled.get("paths", [])) != len(map_data["paths"])):
+            return None
+        if compiled.get("source") != get_source_hash(map_data):
+            log.warning("Compiled paths of %s are out of date, compiling them again", filename)
+            return None
+        return compiled["paths"]
+
     def start_level(self, state: ZoomaGameState):
-        state.start_time = pygame.time.get_ticks()
+        state.start_time = self.get_ticks()
         state.paused = False
         state.forg.reset()
         for entity in state.entity_list:
@@ -174,10 +313,10 @@ class ZoomaGame:
         next_level = state.current_level + 1
 
         if next_level >= len(self.data["levels"]):
-            print("You win!")
+            log.info("You win!")
             return
 
-        print("Advancing to level", next_level + 1)
+        log.info("Advancing to level %d", next_level + 1)
         state.current_level += 1
 
         self.state = self.load_level(state.current_level, state)
@@ -189,11 +328,12 @@ class ZoomaGame:
             return
         
         state.game_over = True
-        print("Game Over")
-        # play a sound?
+        log.info("Game Over")
+
+        state.events.publish(GAME_OVER)
 
         if failure:
-            # self.death_sound.play()
+            self.play_sound("death")
             for entity in state.entity_list:
                 if isinstance(entity, Emitter):
                     entity.deactivate()
@@ -214,62 +354,173 @@ class ZoomaGame:
 
     def process_inputs(self, state: ZoomaGameState):
         """ Process user inputs """
+        moved = False
+        wheel = 0
         for event in pygame.event.get():
             # print(f"Got event: {event}")
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                self.quit()
+            elif event.type == pygame.MOUSEMOTION:
+                moved = True
+            elif event.type == pygame.MOUSEWHEEL:
+                wheel += event.y
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 pressed_buttons = pygame.mouse.get_pressed()
                 if pressed_buttons[0]:
-                    if state.level_complete:
-                        self.advance_level(state)
-                    else:
-                        self.shoot_ball(state)
+                    self.latency.stamp("click")
+                    self.handle_click(state)
 
             elif event.type == pygame.KEYDOWN:
                 # exit game
                 if event.key == K_ESCAPE:
-                    pygame.quit()
-                    sys.exit()
+                    self.quit()
 
-                elif event.key == K_RETURN:
-                    if state.level_complete:
-                        self.advance_level(state)
-                
-                # toggle pause
-                elif event.key == K_p: 
-                    state.paused = not state.paused
+                self.latency.stamp("key")
 
-                # advance level
-                elif event.key == K_n: 
-                    self.advance_level(state)
+                if not self.handle_key(state, event.key):
+                    # Loaded or rewound, the rest of the events go to the new state
+                    state = self.state
 
-                # swap held ball
-                elif event.key == K_SPACE: 
-                    self.swap_held_ball(state)
-                
-                # reset level
-                elif event.key == K_r: 
-                    self.reset_game(state)
-
-                # change chain speed
-                elif event.key in (K_0, K_MINUS, K_EQUALS):
-                    if event.key == K_0:
-                        state.base_chain_speed = 0.5
-                    elif event.key == K_MINUS:
-                        state.base_chain_speed -= 0.05
-                    elif event.key == K_EQUALS:
-                        state.base_chain_speed += 0.05
+        self.update_camera(wheel)
 
         # Current ball always follows the mouse
-        state.forg.set_heading(Vector2(pygame.mouse.get_pos()))
+        if moved:
+            self.latency.stamp("aim")
+        state.forg.set_heading(self.camera.to_world(pygame.mouse.get_pos()))
+
+    def update_camera(self, wheel: int = 0, rate: float = TICK_RATE):
+        """ Scroll while arrow keys are held and zoom around the mouse by wheel steps, once per frame at rate """
+        keys = pygame.key.get_pressed()
+        dx = keys[K_RIGHT] - keys[K_LEFT]
+        dy = keys[K_DOWN] - keys[K_UP]
+        if dx or dy:
+            step = SCROLL_SPEED / rate
+            self.camera.scroll(dx * step, dy * step)
+        if wheel:
+            self.camera.zoom_at(ZOOM_STEP ** wheel, pygame.mouse.get_pos())
+
+    def quit(self):
+        log.info("Frame pacing: %s", self.pacer.format_report())
+        log.info("Input to display latency: %s", self.latency.format_report())
+        if self.capture is not None:
+            self.capture.close()
+        pygame.quit()
+        sys.exit()
+
+    def handle_click(self, state: ZoomaGameState):
+        """ Left click, continue after a level or shoot """
+        if state.level_complete:
+            self.advance_level(state)
+        else:
+            self.shoot_ball(state)
+
+    def handle_key(self, state: ZoomaGameState, key: int) -> bool:
+        """ Game keys, False if they replaced self.state and later input should go to the new one """
+        if key == K_RETURN:
+            if state.level_complete:
+                self.advance_level(state)
+        
+        # toggle pause
+        elif key == K_p: 
+            state.paused = not state.paused
+
+        # advance level
+        elif key == K_n: 
+            self.advance_level(state)
+
+        # quick save and load
+        elif key == K_F5:
+            self.save_quick_snapshot(state)
+        elif key == K_F9:
+            self.load_quick_snapshot(state)
+            return False
+        elif key == K_BACKSPACE:
+            self.rewind(state)
+            return False
+
+        # toggle aim guide
+        elif key == K_g:
+            state.show_aim_guide = not state.show_aim_guide
+
+        # swap held ball
+        elif key == K_SPACE: 
+            self.swap_held_ball(state)
+        
+        # reset level
+        elif key == K_r: 
+            self.reset_game(state)
+
+        # change chain speed
+        elif key in (K_0, K_MINUS, K_EQUALS):
+            if key == K_0:
+                state.base_chain_speed = 0.5
+            elif key == K_MINUS:
+                state.base_chain_speed -= 0.05
+            elif key == K_EQUALS:
+                state.base_chain_speed += 0.05
+            # Chain speeds are otherwise only set again when the chains change
+            state.tasks.wake("motivate_chains")
+
+        return True
+
+    def save_quick_snapshot(self, state: ZoomaGameState):
+        from zooma.snapshot import take_snapshot
+        self.quick_save = take_snapshot(self, state)
+        state.last_message = "Saved"
+
+    def load_quick_snapshot(self, state: ZoomaGameState):
+        if self.quick_save is None:
+            return
+        from zooma.snapshot import restore_snapshot
+        self.state = restore_snapshot(self, state, self.quick_save)
+        self.rewind_snapshots.clear()
+
+    def record_rewind_snapshot(self, state: ZoomaGameState):
+        now = self.get_ticks()
+        if state.paused or now - self.last_rewind_snapshot < 1000:
+            return
+        from zooma.snapshot import take_snapshot
+        self.last_rewind_snapshot = now
+        self.rewind_snapshots.append(take_snapshot(self, state))
+
+    def rewind(self, state: ZoomaGameState):
+        """ Go back to the snapshot from about a second ago """
+        if len(self.rewind_snapshots) == 0:
+            return
+        from zooma.snapshot import restore_snapshot
+        # The newest snapshot may be from this very second, skip past it
+        if len(self.rewind_snapshots) > 1:
+            self.rewind_snapshots.pop()
+        self.state = restore_snapshot(self, state, self.rewind_snapshots[-1])
+        self.last_rewind_snapshot = self.get_ticks()
+
+    def schedule_tasks(self, state: ZoomaGameState):
+        """ Run each task only on the ticks after something it depends on changed """
+        tasks = state.tasks
+        tasks.add("check_win", self.task_check_win,
+                  (BALLS_REMOVED, EMITTER_STOPPED, GAME_OVER))
+        # Emitters wait for the chain in front of them to move on, so check every tick while one runs
+        emit = tasks.add("emit_chain", self.task_emit_chain, (EMITTER_STARTED,))
+        tasks.add("check_progress", self.task_check_progress, (PROGRESS_COMPLETE,))
+        tasks.add("motivate_chains", self.task_motivate_chains,
+                  (CHAIN_CREATED, CHAIN_SPLIT, CHAIN_MERGED, CHAIN_EMPTIED, BALLS_ADDED, BALLS_REMOVED, GAME_OVER))
+        tasks.add("check_colors", self.task_check_colors,
+                  (BALLS_ADDED, BALLS_REMOVED, EMITTER_STOPPED))
+
+        def on_emitter_changed(emitter: Emitter):
+            emitting = any(isinstance(entity, Emitter) and entity.is_active() for entity in state.entity_list)
+            emit.every = 1 if emitting else 0
+
+        state.events.subscribe(EMITTER_STARTED, on_emitter_changed)
+        state.events.subscribe(EMITTER_STOPPED, on_emitter_changed)
+        state.events.subscribe(HOLE_REACHED, lambda hole, chain, count: self.end_game(state, failure=True))
+        state.events.subscribe(COLOR_EXHAUSTED, lambda color: state.forg.replace_color(color))
 
     def do_tasks(self, state: ZoomaGameState):
-        self.task_check_win(state)
-        self.task_emit_chain(state)
-        self.task_motivate_chains(state)
-        self.task_check_colors(state)
+        # Chain speeds follow the clock during the start boost
+        if not state.did_reset_boost:
+            state.tasks.wake("motivate_chains")
+        state.tasks.run(state)
 
     def task_check_win(self, state: ZoomaGameState):
         ball_count = 0
@@ -280,17 +531,23 @@ class ZoomaGame:
         if ball_count == 0:
             if state.game_over:
                 state.show_game_over = True
-            elif state.did_zooma:
+            elif state.did_zooma or self.emitters_exhausted(state):
                 self.end_level(state)
 
 
+    def emitters_exhausted(self, state: ZoomaGameState) -> bool:
+        """ Every emitter has sent its level's chain_length balls """
+        emitters = [entity for entity in state.entity_list if isinstance(entity, Emitter)]
+        return len(emitters) > 0 and all(emitter.is_exhausted() for emitter in emitters)
+
     def task_emit_chain(self, state: ZoomaGameState):
         self.try_to_emit_chain(state)
 
+    def task_check_progress(self, state: ZoomaGameState):
         # See if progress is complete and stop emitters
         if state.progress_percent >= 1 and not state.did_zooma:
             state.did_zooma = True
-            self.zooma_sound.play()
+            self.play_sound("zooma")
 
             # Disable emitters
             for entity in state.entity_list:
@@ -315,10 +572,7 @@ class ZoomaGame:
                         if entity.path != emitter.path:
                             continue
                         
-                        d = emitter.path.distance_between_point_and_position(
-                            0,
-                            entity.get_last_ball().position
-                        )
+                        d = entity.get_tail_offset()
 
                         if d < best_distance:
                             best_distance = d
@@ -329,31 +583,30 @@ class ZoomaGame:
                             break
                 
                 if can_emit:
-                    new_ball = ChainBall(emitter.position, emitter.get_color())
-                    chain = Chain(emitter.path, [new_ball])
-                    chain.shut_the_fuck_up = True
+                    new_ball = state.pools.chain_balls.acquire(emitter.position, emitter.get_color())
+                    emitter.count_emitted()
 
                     if (last_chain is not None and
                         best_distance < last_chain.get_last_ball().radius * 3):
-                        last_chain.append_chain(chain)
+                        last_chain.append_ball(new_ball)
                     else:
-                        state.entity_list.append(chain)
+                        state.entity_list.append(Chain(emitter.path, [new_ball], pools=state.pools,
+                                                        ids=state.chain_ids, events=state.events))
 
     # I got help from a tutor for functionality for multiple pushers
     def task_motivate_chains(self, state: ZoomaGameState):
         path_distances = {}
         path_pushers = {}
 
-        should_boost = (pygame.time.get_ticks() - state.start_time) < state.game_start_boost_time
+        should_boost = (self.get_ticks() - state.start_time) < state.game_start_boost_time
 
         for entity in state.entity_list:
             if isinstance(entity, Chain):
                 if state.game_over:
                     entity.move_speed = state.base_chain_speed * 10
                 else:
-                    first_ball = entity.get_first_ball()
                     path = entity.path
-                    d = path.distance_between_point_and_position(0, first_ball.position)
+                    d = entity.get_head_offset()
                     path_current_best_distance = path_distances.get(path, float('inf'))
                     if d < path_current_best_distance:
                         path_distances[path] = d
@@ -375,25 +628,24 @@ class ZoomaGame:
             self.scan_chain_matches(state)
 
     def task_check_colors(self, state: ZoomaGameState):
-        if not state.did_zooma:
+        if not state.did_zooma and not self.emitters_exhausted(state):
             return
 
-        colors = set()
+        color_ids = set()
         for entity in state.entity_list:
             if isinstance(entity, Chain):
-                chain = entity
-                for i in range(len(chain)):
-                    ball = chain.get_ball(i)
-                    if ball:
-                        color_tuple = tuple(ball.color)
-                        colors.add(color_tuple)
+                color_ids.update(entity.runs.colors)
 
-        if len(colors) > 0:
-            state.level_colors.set_colors([Color(c) for c in colors])
+        if len(color_ids) > 0:
+            exhausted = [color for color in state.level_colors.colors if get_color_id(color) not in color_ids]
+            state.level_colors.set_colors([get_color_by_id(c) for c in sorted(color_ids)])
+            # Published once the colors are updated, so handlers pick from what is left
+            for color in exhausted:
+                state.events.publish(COLOR_EXHAUSTED, color)
 
     def split_chain(self, state: ZoomaGameState, key: int):
         index = key - K_1 + 1
-        print(f"split at {index}")
+        log.debug("split at %d", index)
 
         first_chain = None
         for entity in state.entity_list:
@@ -407,7 +659,7 @@ class ZoomaGame:
         new_chain = first_chain.split(index)
         if new_chain is not None:
             state.entity_list.append(new_chain)
-            print("special split move speed lost motivations", first_chain.get_first_ball().id)
+            log.debug("special split move speed lost motivations %s", first_chain.get_first_ball().id)
             first_chain.move_speed = 0
 
         if len(first_chain) == 0:
@@ -441,56 +693,60 @@ class ZoomaGame:
 
     def check_out_of_bounds(self, state: ZoomaGameState):
         """ Check for out of bound balls and remove from ball_list """
+        width, height = state.world_size
+
         def is_in_bounds(ball):
-            return 0 < ball.position.x < WIDTH and 0 < ball.position.y < HEIGHT
+            return 0 < ball.position.x < width and 0 < ball.position.y < height
         
-        # Remove Movable balls that are out of bounds
+        # Remove Movable balls that are out of bounds, compacting the list once
+        kept = []
         for entity in state.entity_list:
-            if isinstance(entity, ShotBall):
-                if not is_in_bounds(entity):
-                    state.entity_list.remove(entity)
-                    state.chain_count = 0
+            if isinstance(entity, ShotBall) and not is_in_bounds(entity):
+                state.pools.shot_balls.release(entity)
+                state.chain_count = 0
+            else:
+                kept.append(entity)
+
+        if len(kept) != len(state.entity_list):
+            state.entity_list[:] = kept
 
     def check_collisions(self, state: ZoomaGameState):
         """ Check for collisions between balls and targets """
         to_remove = set()
 
-        # Do Death first
+        # Do Death first, only the front chain on a path can reach its hole
+        path_chains = self.get_path_chains(state)
         for entity in state.entity_list:
             if isinstance(entity, DeathHole):
-                for other in state.entity_list:
-                    if isinstance(other, Chain) and entity.check_collision(other):
-                        other.remove_ball(0)
-                        if len(other.data) == 0:
-                            to_remove.add(other)
+                chains = path_chains.get(entity.path)
+                if not chains:
+                    continue
 
-                        if not state.game_over:
-                            self.end_game(state, failure=True)
+                # Ends the game through HOLE_REACHED
+                front = chains[0]
+                if entity.consume(front) > 0 and len(front.data) == 0:
+                    to_remove.add(front)
 
-        for remove in to_remove:
-            if remove in state.entity_list:
-                state.entity_list.remove(remove)
+        if to_remove:
+            state.entity_list[:] = [entity for entity in state.entity_list if entity not in to_remove]
+            to_remove.clear()
 
         for entity in state.entity_list:
-            can_collide = isinstance(entity, ShotBall) or isinstance(entity, Chain)
-            if can_collide:
-                # Check for collisions with other balls
+            if isinstance(entity, ShotBall):
+                # Check for collisions with chains
                 for other in state.entity_list:
-                    if entity == other:
-                        continue
-
-                    if isinstance(entity, ShotBall) and isinstance(other, Chain):
+                    if isinstance(other, Chain):
                         collision = self.check_shot_ball_collision(state, entity, other)
                         if collision:
                             to_remove.add(entity)
                             break
-                        
-                    elif isinstance(entity, Chain) and isinstance(other, Chain):
-                        collision = self.check_chain_collision(state, entity, other)
+
+        self.check_chain_contacts(state)
         
-        for remove in to_remove:
-            if remove in state.entity_list:
-                state.entity_list.remove(remove)
+        if to_remove:
+            state.entity_list[:] = [entity for entity in state.entity_list if entity not in to_remove]
+            for remove in to_remove:
+                state.pools.shot_balls.release(remove)
 
     def check_shot_ball_collision(self, state: ZoomaGameState, shot_ball: ShotBall, entity: Entity):
         if isinstance(entity, Chain):
@@ -500,45 +756,25 @@ class ZoomaGame:
                 
             insertion_record = entity.get_insertion_point(shot_ball)
 
-
-            match_count = 1
-            match_list = []
-            index = insertion_record.index
-            while True:
-                ball = entity.get_ball(index)
-                if ball is None or ball.color != shot_ball.color:
-                    break
-                match_count += 1
-                match_list.append(index)
-                index += 1
-
-            index = insertion_record.index - 1
-            while True:
-                ball = entity.get_ball(index)
-                if ball is None or ball.color != shot_ball.color:
-                    break
-                match_count += 1
-                match_list.append(index)
-                index -= 1
+            match_start, match_length = entity.get_match(insertion_record.index, shot_ball.color)
+            match_count = match_length + 1
             
             if match_count < 3:
-                new_ball = ChainBall(shot_ball.position, shot_ball.color)
+                new_ball = state.pools.chain_balls.acquire(shot_ball.position, shot_ball.color)
                 entity.insert_ball(new_ball, insertion_record)
                 state.chain_count = 0
             else:
                 # remove balls
-                match_list.sort(reverse=True)
-                for index in match_list:
-                    entity.remove_ball(index)
-                print("Splitting chain at", match_list[-1])
-                new_entity = entity.split(match_list[-1])
+                entity.remove_balls(match_start, match_length)
+                log.debug("Splitting chain at %d", match_start)
+                new_entity = entity.split(match_start)
                 if new_entity is not None:
                     state.entity_list.append(new_entity)
                 
                 if len(entity.data) == 0:
                     state.entity_list.remove(entity)
                 else:
-                    print("First chain lost motivation", entity.get_first_ball().id)
+                    log.debug("First chain lost motivation %s", entity.get_first_ball().id)
                     entity.move_speed = 0
                     
                 #calculate score
@@ -549,79 +785,71 @@ class ZoomaGame:
             return True
 
         else:
-            print("Unhandled Collision with non-chain entity")
+            log.warning("Unhandled Collision with non-chain entity")
     
         return False
 
-    def check_chain_collision(self, state: ZoomaGameState, chain1: Chain, chain2: Chain):
-        collision_record = chain1.check_collision(chain2)
-        if not collision_record:
-            return False
+    def get_path_chains(self, state: ZoomaGameState) -> dict[Path, list[Chain]]:
+        """ Chains on each path, the one closest to the death hole first """
+        path_chains = {}
+        for entity in state.entity_list:
+            if isinstance(entity, Chain):
+                path_chains.setdefault(entity.path, []).append(entity)
+
+        for chains in path_chains.values():
+            chains.sort(key=Chain.get_head_offset, reverse=True)
+        return path_chains
+
+    def check_chain_contacts(self, state: ZoomaGameState):
+        """ Only neighbouring chains on a path can touch, so check each pair once """
+        for chains in self.get_path_chains(state).values():
+            front = None
+            for chain in chains:
+                if front is not None and front.touches(chain):
+                    self.check_chain_collision(state, front, chain)
+                    if chain not in state.entity_list:
+                        # Merged into front or matched away
+                        if front not in state.entity_list:
+                            front = None
+                        continue
+                front = chain
 
+    def check_chain_collision(self, state: ZoomaGameState, chain1: Chain, chain2: Chain):
+        """ chain2 has caught up with chain1, the chain in front of it """
         if chain1.is_reversed():
-            print("Reversed chain collision")
+            log.debug("Reversed chain collision")
             if not self._do_chains_match(state, chain1, chain2):
-                print("Chains do not match")
+                log.debug("Chains do not match")
                 state.combo_mult = 1
                 self._merge_chains(state, chain1, chain2)
                 return False
             
-            print("Chains match")
-            match_count = 0
-            matches1 = []
-            matches2 = []
-            color = chain1.get_last_ball().color
-            print("      Color is", color)
-
-            index = len(chain1) - 1
-            while True:
-                ball = chain1.get_ball(index)
-                if ball is not None:
-                    print("      Ball", ball.get_label(), ball.color)
-                else:
-                    print("      Ball is None")
-                if ball is None or ball.color != color:
-                    break
-                match_count += 1
-                matches1.append(index)
-                index -= 1
-
-            index = 0
-            while True:
-                ball = chain2.get_ball(index)
-                if ball is not None:
-                    print("      Ball", ball.get_label(), ball.color)
-                else:
-                    print("      Ball is None")
-                if ball is None or ball.color != color:
-                    break
-                match_count += 1
-                matches2.append(index)
-                index += 1
+            log.debug("Chains match")
+            # Matching balls are the last run of chain1 and the first run of chain2
+            color_id = chain1.runs.last_color()
+            log.debug("      Color is %s", get_color_by_id(color_id))
+
+            matches1 = chain1.runs.lengths[-1]
+            matches2 = chain2.runs.lengths[0] if chain2.runs.first_color() == color_id else 0
+            match_count = matches1 + matches2
 
             if match_count < 3:     
-                print("Match count too low", match_count)      
+                log.debug("Match count too low %d", match_count)      
                 self._merge_chains(state, chain1, chain2)
             else:
-                print("Scoring match", match_count)
-                matches1.sort(reverse=True)
-                matches2.sort(reverse=True)
-
-                for index in matches1:
-                    chain1.remove_ball(index)
-                for index in matches2:
-                    chain2.remove_ball(index)
+                log.debug("Scoring match %d", match_count)
+                chain1.remove_balls(len(chain1) - matches1, matches1)
+                chain2.remove_balls(0, matches2)
 
                 if len(chain1.data) == 0:
                     state.entity_list.remove(chain1)
                 if len(chain2.data) == 0:
                     state.entity_list.remove(chain2)
 
-                print("Scoring combo")
+                log.debug("Scoring combo")
                 self.score_update(state, match_count, is_combo=True)
         else:
-            if not (hasattr(chain1, 'shut_the_fuck_up') or hasattr(chain2, 'shut_the_fuck_up')):
-                print("Normal chain collision")
+            log.debug("Normal chain collision %d %d", chain1.id, chain2.id)
             self._merge_chains(state, chain1, chain2)
         
         return False
@@ -631,13 +859,10 @@ class ZoomaGame:
         path2 = chain2.path
         
         if path1 != path2:
-            print("!!!! ERROR: Merging chains on different paths")
+            log.error("Merging chains on different paths")
             return
         
-        chain1_distance = path1.distance_between_point_and_position(-1, chain1.get_first_ball().position)
-        chain2_distance = path2.distance_between_point_and_position(-1, chain2.get_first_ball().position)
-        
-        if chain1_distance > chain2_distance:
+        if chain1.get_head_offset() < chain2.get_head_offset():
             chain1, chain2 = chain2, chain1
 
         chain_1_speed = chain1.move_speed
@@ -646,8 +871,7 @@ class ZoomaGame:
         merging_chain = chain2
         remaining_chain = chain1
 
-        if not (hasattr(merging_chain, 'shut_the_fuck_up') or hasattr(remaining_chain, 'shut_the_fuck_up')):
-            print(f"Append chain {merging_chain.id} to chain {remaining_chain.id}")
+        log.debug("Append chain %d to chain %d", merging_chain.id, remaining_chain.id)
         remaining_chain.append_chain(merging_chain)
         state.entity_list.remove(merging_chain)
         remaining_chain.move_speed = max(chain_1_speed, chain_2_speed)
@@ -665,6 +889,15 @@ class ZoomaGame:
         score = match_count * 10 * combo_mult * chain_mult
         state.score += score
         state.progress_percent += score / 1500
+        if state.progress_percent >= 1 and not state.did_zooma:
+            state.events.publish(PROGRESS_COMPLETE)
+
+        if is_combo:
+            self.play_sound("combo")
+        elif chain_mult > 1:
+            self.play_sound("chain")
+        else:
+            self.play_sound("match")
 
         score_message = f"+{score}"
         if chain_mult > 1:
@@ -673,26 +906,11 @@ class ZoomaGame:
             score_message += f" Combo x{combo_mult}"
 
         state.last_message = score_message
-        print(f"Score: {score_message}")
+        log.info("Score: %s", score_message)
         
         
     def scan_chain_matches(self, state: ZoomaGameState):
-        path_chains = {}
-        
-        for entity in state.entity_list:
-            if isinstance(entity, Chain):
-                path = entity.path
-                if path not in path_chains:
-                    path_chains[path] = []
-                path_chains[path].append(entity)
-
-        def chain_sort_key(chain: Chain):
-            path = chain.path
-            return path.distance_between_point_and_position(-1, chain.get_first_ball().position)
-
-        for path, chains in path_chains.items():
-            chains.sort(key=chain_sort_key)
-
+        for chains in self.get_path_chains(state).values():
             for i in range(len(chains) - 1):
                 chain1 = chains[i]
                 chain2 = chains[i + 1]
@@ -709,20 +927,14 @@ class ZoomaGame:
         path2 = chain2.path
         
         if path1 != path2:
-            print("!!!! ERROR: Comparing chains on different paths")
+            log.error("Comparing chains on different paths")
             return False
         
-        chain1_distance = path1.distance_between_point_and_position(-1, chain1.get_first_ball().position)
-        chain2_distance = path2.distance_between_point_and_position(-1, chain2.get_first_ball().position)
-        
         # Make chain 1 the chain closer to the death hole
-        if chain1_distance > chain2_distance:
+        if chain1.get_head_offset() < chain2.get_head_offset():
             chain1, chain2 = chain2, chain1
         
-        a = chain1.get_last_ball()
-        b = chain2.get_first_ball()
-        
-        return a.color == b.color
+        return chain1.runs.last_color() == chain2.runs.first_color()
 
     def update_display(self, state: ZoomaGameState):
         """ all the draws of python objects should occur here"""
@@ -739,20 +951,53 @@ class ZoomaGame:
             self.draw_level_complete(state)
         
 
-        # Update the display
-        pygame.display.flip()
+        # Update the display, headless games only draw to capture
+        if not self.headless:
+            pygame.display.flip()
+            self.latency.flipped()
 
     def draw_entities(self, state: ZoomaGameState):
         # Draw all the entities
         for entity in state.entity_list:
-            entity.draw(self.screen)
+            entity.draw(self.screen, self.camera)
+
+        if state.show_aim_guide:
+            self.draw_aim_guide(state)
+
+    def draw_aim_guide(self, state: ZoomaGameState):
+        forg = state.forg
+        if forg is None or forg.is_dead or forg.held_ball is None:
+            return
+
+        chains = [entity for entity in state.entity_list if isinstance(entity, Chain)]
+        from zooma.utils.raycast import ChainRayCaster
+        hit = ChainRayCaster(chains).cast_from_forg(forg)
+        start = forg._get_held_position()
+        if hit is None:
+            end = start + forg.heading * max(state.world_size)
+        else:
+            end = hit.position
+            draw_circle(self.screen, self.camera, forg.held_ball.color, end, forg.held_ball.radius, 1)
+        draw_line(self.screen, self.camera, Color('gray40'), start, end, 1)
+
+    def play_sound(self, event: str):
+        """ Sound effect for a game event, see zooma.audio.EVENT_CLIPS """
+        if self.sounds is not None:
+            self.sounds.play(event)
+
+    def get_font(self) -> pygame.font.Font:
+        if self.font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            self.font = pygame.font.Font(None, 36) #set the font for the text
+        return self.font
 
     def draw_text(self, screen: pygame.Surface, 
                   text: str, pos: tuple[int, int], 
                   color: Color = Color('white'), 
                   centered: bool = False, 
                   centered_x: bool = False):
-        text_surface = self.font.render(text, True, color)
+        text_surface = self.get_font().render(text, True, color)
         if centered:
             pos = (pos[0] - text_surface.get_width() / 2, pos[1] - text_surface.get_height() / 2)
         if centered_x:
@@ -820,6 +1065,12 @@ class ZoomaGame:
 
 
 def main():
+    configure_from_env()
+    if "--split" in sys.argv[1:]:
+        # Simulation and rendering in separate processes
+        from zooma.split_mode import run_split
+        run_split()
+        return
     game = ZoomaGame()
     game.run()
 
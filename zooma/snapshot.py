@@ -0,0 +1,253 @@
+import base64
+import json
+import sys
+from array import array
+from dataclasses import asdict, dataclass, field
+
+from pygame import Vector2
+
+from zooma.entities.ball import ChainBall, HeldBall, ShotBall
+from zooma.entities.chain import BallRecord, Chain, InsertionRecord
+from zooma.entities.emitter import Emitter
+from zooma.main import ZoomaGame, ZoomaGameState
+from zooma.utils.color_runs import ColorRuns
+from zooma.utils.colors import get_color_by_id, get_color_id
+from zooma.utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Save and restore a running game.
+#
+# Level entities (paths, emitters, death holes and the forg) are created by
+# load_level and never removed, so a snapshot only refers to them by their
+# place in entity_list. Everything that changes during play is packed into
+# flat arrays, one set per chain, which keeps snapshots small and fast to
+# take and restore. Saved to disk as JSON with the arrays as base64 bytes,
+# so loading a snapshot file never runs code from it.
+
+STATE_FIELDS = (
+    "current_level", "level_name", "score", "progress_percent", "chain_count",
+    "combo_mult", "paused", "last_message", "base_chain_speed", "did_zooma",
+    "game_over", "level_complete", "show_game_over", "did_reset_boost",
+    "difficulty",
+)
+
+NO_COLOR = 255
+SNAPSHOT_FORMAT = 1
+
+
+@dataclass
+class ChainSnapshot:
+    id: int
+    path_index: int
+    move_speed: float
+    positions: array     # x, y per ball, packed by the game's Quantizer
+    target_ids: array
+    ball_ids: array
+    color_ids: array
+    insertions: array    # index, target_id per pending insertion
+
+
+@dataclass
+class GameSnapshot:
+    state_values: tuple
+    # Entity order, ("level", index) or ("chain", index) or ("shot", index)
+    order: list = field(default_factory=list)
+    chains: list = field(default_factory=list)
+    shot_values: array = field(default_factory=lambda: array('d'))  # x, y, hx, hy, speed
+    shot_colors: array = field(default_factory=lambda: array('B'))
+    level_colors: array = field(default_factory=lambda: array('B'))
+    emitters: list = field(default_factory=list)   # (active, color sequence state, emitted)
+    forg: tuple = ()
+    time_since_start: int = 0
+    rng_state: tuple = ()
+    next_chain_id: int = 1
+
+
+def _color_id_or_none(color) -> int:
+    return NO_COLOR if color is None else get_color_id(color)
+
+
+def take_snapshot(game: ZoomaGame, state: ZoomaGameState) -> GameSnapshot:
+    now = game.get_ticks()
+    snapshot = GameSnapshot(tuple(getattr(state, name) for name in STATE_FIELDS))
+    snapshot.time_since_start = now - state.start_time
+    snapshot.rng_state = state.rng.getstate()
+    snapshot.next_chain_id = state.chain_ids.next_id
+    snapshot.level_colors = array('B', [get_color_id(c) for c in state.level_colors.colors])
+
+    for i, entity in enumerate(state.entity_list):
+        if isinstance(entity, Chain):
+            snapshot.order.append(("chain", len(snapshot.chains)))
+            snapshot.chains.append(_snapshot_chain(game, state, entity))
+        elif isinstance(entity, ShotBall):
+            snapshot.order.append(("shot", len(snapshot.shot_colors)))
+            snapshot.shot_values.extend((entity.position.x, entity.position.y,
+                                         entity.heading.x, entity.heading.y, entity.speed))
+            snapshot.shot_colors.append(get_color_id(entity.color))
+        else:
+            snapshot.order.append(("level", i))
+            if isinstance(entity, Emitter):
+                snapshot.emitters.append((entity.active, entity.color_sequence.get_state(), entity.emitted))
+
+    forg = state.forg
+    snapshot.forg = (
+        forg.heading.x, forg.heading.y,
+        _color_id_or_none(forg.held_ball.color if forg.held_ball else None),
+        _color_id_or_none(forg.reserve_ball.color if forg.reserve_ball else None),
+        now - forg.last_shot_time, forg.is_dead, now - forg.time_of_death,
+        forg.color_sequence.get_state(),
+    )
+    return snapshot
+
+
+def _snapshot_chain(game: ZoomaGame, state: ZoomaGameState, chain: Chain) -> ChainSnapshot:
+    positions = []
+    target_ids = array('i')
+    ball_ids = array('i')
+    color_ids = array('B')
+    for record in chain.data:
+        ball = record.ball
+        positions.append(ball.position.x)
+        positions.append(ball.position.y)
+        target_ids.append(record.target_id)
+        ball_ids.append(ball.id)
+        color_ids.append(get_color_id(ball.color))
+
+    insertions = array('i')
+    for insertion in chain.pending_insertions:
+        insertions.append(insertion.index)
+        insertions.append(insertion.target_id)
+
+    return ChainSnapshot(chain.id, state.entity_list.index(chain.path), chain.move_speed,
+                         game.numeric.pack(positions), target_ids, ball_ids, color_ids, insertions)
+
+
+def restore_snapshot(game: ZoomaGame, state: ZoomaGameState, snapshot: GameSnapshot) -> ZoomaGameState:
+    """ Put state back the way it was when the snapshot was taken """
+    level = snapshot.state_values[STATE_FIELDS.index("current_level")]
+    if level != state.current_level or len(state.entity_list) == 0:
+        current_level = state.current_level
+        state.current_level = level
+        loaded = game.load_level(level, state)
+        if loaded is None:
+            log.error("Can't restore snapshot, level %s failed to load", level)
+            state.current_level = current_level
+            return state
+        state = loaded
+        game.state = state
+
+    level_entities = list(state.entity_list)
+    for name, value in zip(STATE_FIELDS, snapshot.state_values):
+        setattr(state, name, value)
+
+    now = game.get_ticks()
+    state.start_time = now - snapshot.time_since_start
+    state.rng.setstate(snapshot.rng_state)
+    state.level_colors.set_colors([get_color_by_id(c) for c in snapshot.level_colors])
+
+    entity_list = []
+    emitters = iter(snapshot.emitters)
+    for kind, index in snapshot.order:
+        if kind == "chain":
+            entity_list.append(_restore_chain(game, level_entities, snapshot.chains[index], state))
+        elif kind == "shot":
+            x, y, hx, hy, speed = snapshot.shot_values[index * 5:index * 5 + 5]
+            shot = ShotBall(Vector2(x, y), get_color_by_id(snapshot.shot_colors[index]))
+            shot.set_heading(Vector2(hx, hy))
+            shot.speed = speed
+            entity_list.append(shot)
+        else:
+            entity = level_entities[index]
+            if isinstance(entity, Emitter):
+                active, sequence, emitted = next(emitters)
+                entity.emitted = emitted
+                if active:
+                    entity.activate()
+                else:
+                    entity.deactivate()
+                entity.color_sequence.set_state(sequence)
+            entity_list.append(entity)
+    state.entity_list[:] = entity_list
+    # Rebuilding the chains allocated ids, put the counter back after them
+    state.chain_ids.next_id = snapshot.next_chain_id
+
+    forg = state.forg
+    hx, hy, held, reserve, since_shot, is_dead, since_death, sequence = snapshot.forg
+    forg.heading = Vector2(hx, hy)
+    forg.held_ball = None if held == NO_COLOR else HeldBall(get_color_by_id(held))
+    forg.reserve_ball = None if reserve == NO_COLOR else HeldBall(get_color_by_id(reserve))
+    forg.last_shot_time = now - since_shot
+    forg.is_dead = is_dead
+    forg.time_of_death = now - since_death
+    forg.color_sequence.set_state(sequence)
+
+    state.tasks.wake_all()
+    return state
+
+
+def _restore_chain(game: ZoomaGame, level_entities: list, saved: ChainSnapshot, state: ZoomaGameState) -> Chain:
+    positions = game.numeric.unpack(saved.positions)
+    records = []
+    for i, color_id in enumerate(saved.color_ids):
+        ball = ChainBall(Vector2(positions[i * 2], positions[i * 2 + 1]), get_color_by_id(color_id))
+        target_id = saved.target_ids[i]
+        ball.with_id(saved.ball_ids[i]).with_target_id(target_id)
+        records.append(BallRecord(ball, target_id))
+
+    chain = Chain(level_entities[saved.path_index], records, ColorRuns(saved.color_ids), state.pools, state.chain_ids,
+                  state.events)
+    chain.id = saved.id
+    for record in chain.data:
+        record.ball.with_chain_id(saved.id)
+    chain.move_speed = saved.move_speed
+
+    insertions = saved.insertions
+    chain.pending_insertions = [InsertionRecord(insertions[i], insertions[i + 1])
+                                for i in range(0, len(insertions), 2)]
+    return chain
+
+
+def _encode(value):
+    """ JSON friendly copy of snapshot values, keeping arrays and tuples apart from lists """
+    if isinstance(value, array):
+        return {"array": value.typecode, "data": base64.b64encode(value.tobytes()).decode("ascii")}
+    if isinstance(value, tuple):
+        return {"tuple": [_encode(item) for item in value]}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    return value
+
+
+def _decode(value, byteorder: str):
+    if isinstance(value, list):
+        return [_decode(item, byteorder) for item in value]
+    if isinstance(value, dict):
+        if "array" in value:
+            decoded = array(value["array"])
+            decoded.frombytes(base64.b64decode(value["data"]))
+            if byteorder != sys.byteorder:
+                decoded.byteswap()
+            return decoded
+        if "tuple" in value:
+            return tuple(_decode(item, byteorder) for item in value["tuple"])
+        return {key: _decode(item, byteorder) for key, item in value.items()}
+    return value
+
+
+def save_snapshot(snapshot: GameSnapshot, filename: str):
+    data = {"format": SNAPSHOT_FORMAT, "byteorder": sys.byteorder, "snapshot": _encode(asdict(snapshot))}
+    with open(filename, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+
+
+def load_snapshot(filename: str) -> GameSnapshot:
+    with open(filename, "r") as f:
+        data = json.load(f)
+    if data.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {data.get('format')} in {filename}")
+    fields = _decode(data["snapshot"], data["byteorder"])
+    fields["chains"] = [ChainSnapshot(**chain) for chain in fields["chains"]]
+    return GameSnapshot(**fields)
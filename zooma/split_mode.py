@@ -0,0 +1,277 @@
+import multiprocessing
+import queue
+import sys
+from array import array
+
+import pygame
+from pygame import Vector2, Color
+from pygame.locals import *
+
+from zooma.main import ZoomaGame, ZoomaGameState, WIDTH, HEIGHT, TICK_RATE
+from zooma.entities.ball import ChainBall, ShotBall, HeldBall
+from zooma.entities.chain import Chain
+from zooma.audio import SoundManager
+from zooma.utils.colors import get_color_id, get_color_by_id
+from zooma.utils.shared_frame import (SharedFrameBuffer, NO_COLOR, PAUSED, LEVEL_COMPLETE, GAME_OVER,
+                                      SHOW_GAME_OVER, FORG_DEAD)
+from zooma.utils.numeric import FLOAT64
+from zooma.utils.pacing import FramePacer, LatencyTracker
+from zooma.utils.log import get_logger, configure_from_env
+
+log = get_logger(__name__)
+
+# Two process mode, run with `zooma --split`.
+#
+# The simulation runs headless in a child process at TICK_RATE and writes
+# every tick to a zooma.utils.shared_frame buffer. This process owns the
+# window: it draws the newest tick it finds with the usual entity visuals
+# at its own frame rate, and sends input to the simulation over a queue.
+# Sounds play from the simulation process. The aim guide needs the chains
+# themselves and is not drawn in this mode.
+
+RENDER_RATE = 60
+
+
+def _color_id_or_none(ball) -> int:
+    return NO_COLOR if ball is None else get_color_id(ball.color)
+
+
+def write_frame(frames: SharedFrameBuffer, state: ZoomaGameState, tick: int, input_seq: int = 0):
+    """ Copy what the renderer needs out of state """
+    ball_positions = array('f')
+    ball_colors = array('h')
+    shot_positions = array('f')
+    shot_colors = array('h')
+    for entity in state.entity_list:
+        if isinstance(entity, Chain):
+            # Color ids of a chain are already kept as runs
+            for color_id, length in zip(entity.runs.colors, entity.runs.lengths):
+                ball_colors.extend([color_id] * length)
+            for record in entity.data:
+                position = record.ball.position
+                ball_positions.append(position.x)
+                ball_positions.append(position.y)
+        elif isinstance(entity, ShotBall):
+            shot_positions.append(entity.position.x)
+            shot_positions.append(entity.position.y)
+            shot_colors.append(get_color_id(entity.color))
+
+    flags = 0
+    if state.paused:
+        flags |= PAUSED
+    if state.level_complete:
+        flags |= LEVEL_COMPLETE
+    if state.game_over:
+        flags |= GAME_OVER
+    if state.show_game_over:
+        flags |= SHOW_GAME_OVER
+    forg = state.forg
+    if forg.is_dead:
+        flags |= FORG_DEAD
+
+    frames.write(tick, state.current_level, state.score, state.progress_percent, flags,
+                 (forg.heading.x, forg.heading.y), _color_id_or_none(forg.held_ball),
+                 _color_id_or_none(forg.reserve_ball),
+                 ball_positions, ball_colors, shot_positions, shot_colors, state.last_message, input_seq)
+
+
+def run_simulation(frames_name: str, inputs: multiprocessing.Queue, numeric_mode: str):
+    """ Child process, step the game in real time and publish every tick """
+    configure_from_env()
+    frames = SharedFrameBuffer(frames_name)
+    game = ZoomaGame(headless=True, numeric_mode=numeric_mode)
+    game.sounds = SoundManager()
+    game.sounds.start()
+    game.init_game()
+    game.state = game.load_level(game.state.current_level, game.state)
+    game.start_level(game.state)
+
+    tick = 0
+    input_seq = 0
+    pacer = FramePacer(TICK_RATE)
+    running = True
+    while running:
+        state = game.state
+        while True:
+            try:
+                message = inputs.get_nowait()
+            except queue.Empty:
+                break
+            seq, kind = message[0], message[1]
+            if kind == "quit":
+                running = False
+                break
+            elif kind == "aim":
+                state.forg.set_heading(Vector2(message[2], message[3]))
+            elif kind == "click":
+                game.handle_click(state)
+            elif kind == "key":
+                game.handle_key(state, message[2])
+            input_seq = seq
+            state = game.state
+
+        game.tick(state)
+        game.record_rewind_snapshot(state)
+        tick += 1
+        write_frame(frames, game.state, tick, input_seq)
+        pacer.wait()
+
+    log.info("Simulation pacing: %s", pacer.format_report())
+    frames.close()
+
+
+class SplitRenderer:
+    def __init__(self, frames: SharedFrameBuffer, inputs: multiprocessing.Queue):
+        self.frames = frames
+        self.inputs = inputs
+
+        # A game that never ticks, it holds the level entities and draws the HUD
+        self.view = ZoomaGame(headless=True)
+        self.view.init_game()
+        self.view.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Zooma (not quite deluxe)")
+        self.level = None
+
+        # Reused for drawing every ball
+        self.chain_ball = ChainBall(Vector2(), Color('white'))
+        self.shot_ball = ShotBall(Vector2(), Color('white'))
+        self.last_aim = None
+        # Inputs are numbered, each tick says which it has seen
+        self.input_seq = 0
+        self.latency = LatencyTracker()
+        self.pacer = FramePacer(RENDER_RATE)
+
+    def load_level(self, level: int):
+        state = self.view.state
+        state.current_level = level
+        self.view.state = self.view.load_level(level, state)
+        self.level = level
+
+    def send(self, kind: str, *args):
+        self.input_seq += 1
+        self.latency.stamp(kind, self.input_seq)
+        self.inputs.put((self.input_seq, kind, *args))
+
+    def send_inputs(self) -> bool:
+        """ Forward input to the simulation, False when the window is closed """
+        wheel = 0
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+            elif event.type == pygame.MOUSEWHEEL:
+                wheel += event.y
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if pygame.mouse.get_pressed()[0]:
+                    self.send("click")
+            elif event.type == pygame.KEYDOWN:
+                if event.key == K_ESCAPE:
+                    return False
+                self.send("key", event.key)
+
+        # The camera only exists here, the simulation is sent world positions
+        self.view.update_camera(wheel, RENDER_RATE)
+        aim = tuple(self.view.camera.to_world(pygame.mouse.get_pos()))
+        if aim != self.last_aim:
+            self.last_aim = aim
+            self.send("aim", aim[0], aim[1])
+        return True
+
+    def draw(self) -> int | None:
+        """ Draw the newest tick and return the last input it saw
+
+        None if there is no tick yet or it was overwritten while drawing.
+        """
+        frame = self.frames.read()
+        if frame is None:
+            return None
+        try:
+            if frame.level != self.level:
+                self.load_level(frame.level)
+            self._draw_frame(frame)
+            return frame.input_seq if frame.is_current() else None
+        finally:
+            frame.release()
+
+    def _draw_frame(self, frame):
+        screen = self.view.screen
+        state = self.view.state
+        state.score = frame.score
+        state.progress_percent = frame.progress
+        state.last_message = frame.message
+        state.level_complete = frame.has_flag(LEVEL_COMPLETE)
+        state.show_game_over = frame.has_flag(SHOW_GAME_OVER)
+
+        forg = state.forg
+        forg.heading = Vector2(frame.heading_x, frame.heading_y)
+        forg.is_dead = frame.has_flag(FORG_DEAD)
+        forg.held_ball = None if frame.held_color == NO_COLOR else HeldBall(get_color_by_id(frame.held_color))
+        forg.reserve_ball = None if frame.reserve_color == NO_COLOR else HeldBall(get_color_by_id(frame.reserve_color))
+
+        camera = self.view.camera
+        screen.fill(Color('black'))
+        # Paths, emitters, death holes and the forg
+        for entity in state.entity_list:
+            entity.draw(screen, camera)
+
+        for ball, positions, colors in ((self.chain_ball, frame.ball_positions, frame.ball_colors),
+                                        (self.shot_ball, frame.shot_positions, frame.shot_colors)):
+            for i, color_id in enumerate(colors):
+                ball.position.update(positions[i * 2], positions[i * 2 + 1])
+                ball.color = get_color_by_id(color_id)
+                ball.draw(screen, camera)
+
+        self.view.draw_status_display(state)
+        if state.show_game_over:
+            self.view.draw_game_over(state)
+        elif state.level_complete:
+            self.view.draw_level_complete(state)
+
+    def run(self, simulation: multiprocessing.Process):
+        while simulation.is_alive():
+            if not self.send_inputs():
+                break
+            # Overtaken by the simulation twice while drawing, draw the newer tick
+            shown_seq = None
+            for _ in range(3):
+                shown_seq = self.draw()
+                if shown_seq is not None:
+                    break
+            pygame.display.flip()
+            if shown_seq is not None:
+                self.latency.flipped(shown_seq)
+            self.pacer.wait()
+
+        log.info("Frame pacing: %s", self.pacer.format_report())
+        log.info("Input to display latency: %s", self.latency.format_report())
+
+
+def run_split(numeric_mode: str = FLOAT64):
+    configure_from_env()
+    pygame.display.init()
+    pygame.font.init()
+
+    frames = SharedFrameBuffer()
+    # Spawned, SDL state doesn't survive a fork
+    context = multiprocessing.get_context("spawn")
+    inputs = context.Queue()
+    simulation = context.Process(target=run_simulation, args=(frames.name, inputs, numeric_mode),
+                                 name="zooma-simulation", daemon=True)
+    simulation.start()
+    try:
+        SplitRenderer(frames, inputs).run(simulation)
+    finally:
+        inputs.put((0, "quit"))
+        simulation.join(timeout=2)
+        if simulation.is_alive():
+            simulation.terminate()
+        frames.close()
+        frames.unlink()
+        pygame.quit()
+
+
+def main():
+    run_split(sys.argv[1] if len(sys.argv) > 1 else FLOAT64)
+
+
+if __name__ == "__main__":
+    main()
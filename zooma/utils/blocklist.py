@@ -0,0 +1,205 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+# A list stored as a list of blocks, used for the balls of a chain.
+#
+# Inserting or removing touches one block of at most 2 * block_size items
+# plus the block start offsets, instead of shifting the whole list. Split
+# and concat hand whole blocks over. Chains shorter than one block, the
+# usual case, are a single block and index straight into it.
+
+BLOCK_SIZE = 512
+
+
+class BlockList:
+    def __init__(self, items=(), block_size: int = BLOCK_SIZE):
+        self.block_size = block_size
+        items = list(items)
+        self.blocks: list[list] = [items[i:i + block_size] for i in range(0, len(items), block_size)]
+        self.count = len(items)
+        self._starts: list[int] | None = None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for block in self.blocks:
+            yield from block
+
+    def __reversed__(self):
+        for block in reversed(self.blocks):
+            yield from reversed(block)
+
+    def __repr__(self):
+        return f"BlockList({list(self)!r})"
+
+    def _get_starts(self) -> list[int]:
+        # Index of the first item of each block, rebuilt lazily after edits
+        if self._starts is None:
+            self._starts = [0, *accumulate(map(len, self.blocks))][:-1]
+        return self._starts
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        """ (block, offset in block) of item index """
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("BlockList index out of range")
+        if len(self.blocks) == 1:
+            return 0, index
+        starts = self._get_starts()
+        block = bisect_right(starts, index) - 1
+        return block, index - starts[block]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.count)
+            if step != 1:
+                return list(self)[index]
+            return self._get_range(start, stop)
+
+        blocks = self.blocks
+        if len(blocks) == 1:
+            return blocks[0][index]
+        block, offset = self._locate(index)
+        return blocks[block][offset]
+
+    def __setitem__(self, index: int, item):
+        block, offset = self._locate(index)
+        self.blocks[block][offset] = item
+
+    def _get_range(self, start: int, stop: int) -> list:
+        items = []
+        if start >= stop:
+            return items
+        block, offset = self._locate(start)
+        remaining = stop - start
+        while remaining > 0:
+            taken = self.blocks[block][offset:offset + remaining]
+            items.extend(taken)
+            remaining -= len(taken)
+            block += 1
+            offset = 0
+        return items
+
+    def append(self, item):
+        if self.blocks and len(self.blocks[-1]) < self.block_size * 2:
+            self.blocks[-1].append(item)
+        else:
+            if self._starts is not None:
+                self._starts.append(self.count)
+            self.blocks.append([item])
+        self.count += 1
+
+    def insert(self, index: int, item):
+        if index < 0:
+            index = max(0, index + self.count)
+        if index >= self.count:
+            self.append(item)
+            return
+
+        block, offset = self._locate(index)
+        self.blocks[block].insert(offset, item)
+        self.count += 1
+        self._starts = None
+
+        # Keep blocks small so inserts stay cheap
+        if len(self.blocks[block]) > self.block_size * 2:
+            items = self.blocks[block]
+            self.blocks[block:block + 1] = [items[:self.block_size], items[self.block_size:]]
+
+    def pop(self, index: int = -1):
+        block, offset = self._locate(index)
+        item = self.blocks[block].pop(offset)
+        self.count -= 1
+        self._starts = None
+        self._join(block)
+        return item
+
+    def __delitem__(self, index):
+        if not isinstance(index, slice):
+            self.pop(index)
+            return
+
+        start, stop, step = index.indices(self.count)
+        if step != 1:
+            raise ValueError("BlockList only deletes contiguous slices")
+        if start >= stop:
+            return
+
+        block, offset = self._locate(start)
+        remaining = stop - start
+        first_block = block
+        while remaining > 0:
+            items = self.blocks[block]
+            taken = min(remaining, len(items) - offset)
+            if offset == 0 and taken == len(items):
+                # Whole blocks are dropped below
+                items.clear()
+            else:
+                del items[offset:offset + taken]
+            remaining -= taken
+            block += 1
+            offset = 0
+
+        self.blocks[first_block:block] = [items for items in self.blocks[first_block:block] if items]
+        self.count -= stop - start
+        self._starts = None
+        self._join(first_block)
+
+    def _join(self, block: int):
+        """ Drop block if it is empty, or merge it into its neighbour if both are small """
+        if block >= len(self.blocks):
+            return
+        if not self.blocks[block]:
+            del self.blocks[block]
+            return
+        if block + 1 < len(self.blocks) and len(self.blocks[block]) + len(self.blocks[block + 1]) <= self.block_size:
+            self.blocks[block].extend(self.blocks.pop(block + 1))
+        elif block > 0 and len(self.blocks[block - 1]) + len(self.blocks[block]) <= self.block_size:
+            self.blocks[block - 1].extend(self.blocks.pop(block))
+
+    def split(self, index: int) -> "BlockList":
+        """ Cut off items index onwards into a new BlockList """
+        tail = BlockList(block_size=self.block_size)
+        if index >= self.count:
+            return tail
+        if index <= 0:
+            tail.blocks, self.blocks = self.blocks, []
+            tail.count, self.count = self.count, 0
+            self._starts = None
+            return tail
+
+        block, offset = self._locate(index)
+        if offset == 0:
+            tail.blocks = self.blocks[block:]
+            del self.blocks[block:]
+        else:
+            items = self.blocks[block]
+            tail.blocks = [items[offset:]] + self.blocks[block + 1:]
+            del items[offset:]
+            del self.blocks[block + 1:]
+
+        tail.count = self.count - index
+        self.count = index
+        self._starts = None
+        return tail
+
+    def concat(self, other: "BlockList"):
+        """ Move every item of other to the end of this list, other is left empty """
+        if other.count == 0:
+            return
+        join = len(self.blocks)
+        self.blocks.extend(other.blocks)
+        self.count += other.count
+        other.blocks = []
+        other.count = 0
+        other._starts = None
+        self._starts = None
+        if join > 0:
+            self._join(join - 1)
+
+    def clear(self):
+        self.blocks = []
+        self.count = 0
+        self._starts = None
@@ -0,0 +1,136 @@
+import math
+
+import pygame
+from pygame import Vector2
+
+# Maps world positions to the window, for levels larger than the screen.
+#
+# A level's world is SCREEN_WIDTH x SCREEN_HEIGHT unless its map sets
+# "world": {"size": [width, height]}. The camera scrolls and zooms over it
+# and is clamped so it never shows past the world's edge, a world that
+# fits the window is always shown whole and untransformed. Entities draw
+# through draw_circle and draw_line with the camera, or None for plain
+# screen coordinates, and skip what is outside get_view_rect().
+
+SCREEN_WIDTH, SCREEN_HEIGHT = 1000, 800
+MAX_ZOOM = 3.0
+# Zoom factor of one mouse wheel step
+ZOOM_STEP = 1.1
+# Screen px scrolled per second while an arrow key is held
+SCROLL_SPEED = 900
+
+
+def get_world_size(map_data: dict) -> tuple[int, int]:
+    """ Size of a level's world, the screen unless the map says otherwise """
+    world = map_data.get("world")
+    if world is None or "size" not in world:
+        return SCREEN_WIDTH, SCREEN_HEIGHT
+    width, height = world["size"]
+    return max(int(width), SCREEN_WIDTH), max(int(height), SCREEN_HEIGHT)
+
+
+class Camera:
+    def __init__(self, view_size: tuple[int, int] = (SCREEN_WIDTH, SCREEN_HEIGHT),
+                 world_size: tuple[int, int] | None = None):
+        self.view_width, self.view_height = view_size
+        # World position of the top left corner of the window
+        self.offset = Vector2(0, 0)
+        self.zoom = 1.0
+        self.min_zoom = 1.0
+        # No transform at all, drawing can use world positions as they are
+        self.identity = True
+        self.set_world_size(world_size or view_size)
+
+    def set_world_size(self, world_size: tuple[int, int]):
+        self.world_width, self.world_height = world_size
+        # Zoomed all the way out the whole world fits in the window
+        self.min_zoom = min(1.0, self.view_width / self.world_width, self.view_height / self.world_height)
+        self.zoom = max(self.zoom, self.min_zoom)
+        self.clamp()
+
+    def reset(self):
+        self.zoom = 1.0
+        self.offset.update(0, 0)
+        self.clamp()
+
+    def fit_world(self):
+        """ Zoom out until the whole world is in view """
+        self.zoom = self.min_zoom
+        self.clamp()
+
+    def clamp(self):
+        """ Keep the view inside the world, centered on an axis the world doesn't fill """
+        visible_width = self.view_width / self.zoom
+        visible_height = self.view_height / self.zoom
+        if visible_width >= self.world_width:
+            self.offset.x = (self.world_width - visible_width) / 2
+        else:
+            self.offset.x = max(0, min(self.offset.x, self.world_width - visible_width))
+        if visible_height >= self.world_height:
+            self.offset.y = (self.world_height - visible_height) / 2
+        else:
+            self.offset.y = max(0, min(self.offset.y, self.world_height - visible_height))
+        self.identity = self.zoom == 1 and self.offset.x == 0 and self.offset.y == 0
+
+    def shows_whole_world(self) -> bool:
+        return (self.offset.x <= 0 and self.offset.y <= 0 and
+                self.view_width / self.zoom >= self.world_width and
+                self.view_height / self.zoom >= self.world_height)
+
+    def to_screen(self, position) -> Vector2:
+        if self.identity:
+            return Vector2(position)
+        return (Vector2(position) - self.offset) * self.zoom
+
+    def to_world(self, position) -> Vector2:
+        if self.identity:
+            return Vector2(position)
+        return Vector2(position) / self.zoom + self.offset
+
+    def scale(self, length: float) -> float:
+        return length * self.zoom
+
+    def get_view_rect(self, margin: float = 0) -> tuple[float, float, float, float]:
+        """ (min x, min y, max x, max y) of the world in the window, grown by margin """
+        return (self.offset.x - margin, self.offset.y - margin,
+                self.offset.x + self.view_width / self.zoom + margin,
+                self.offset.y + self.view_height / self.zoom + margin)
+
+    def is_visible(self, position: Vector2, radius: float = 0) -> bool:
+        min_x, min_y, max_x, max_y = self.get_view_rect(radius)
+        return min_x <= position.x <= max_x and min_y <= position.y <= max_y
+
+    def scroll(self, dx: float, dy: float):
+        """ Move the view by screen px """
+        self.offset.x += dx / self.zoom
+        self.offset.y += dy / self.zoom
+        self.clamp()
+
+    def center_on(self, position: Vector2):
+        self.offset.x = position.x - self.view_width / self.zoom / 2
+        self.offset.y = position.y - self.view_height / self.zoom / 2
+        self.clamp()
+
+    def zoom_at(self, factor: float, screen_position) -> None:
+        """ Zoom by factor, keeping the world point under screen_position in place """
+        anchor = self.to_world(screen_position)
+        self.zoom = max(self.min_zoom, min(MAX_ZOOM, self.zoom * factor))
+        self.offset = anchor - Vector2(screen_position) / self.zoom
+        self.clamp()
+
+
+def draw_circle(screen: pygame.Surface, camera: Camera | None, color, position, radius: float, width: int = 0):
+    if camera is not None and not camera.identity:
+        position = camera.to_screen(position)
+        radius = camera.scale(radius)
+        if width:
+            width = max(1, round(camera.scale(width)))
+    pygame.draw.circle(screen, color, position, radius, width)
+
+
+def draw_line(screen: pygame.Surface, camera: Camera | None, color, start, end, width: int = 1):
+    if camera is not None and not camera.identity:
+        start = camera.to_screen(start)
+        end = camera.to_screen(end)
+        width = max(1, math.floor(camera.scale(width)))
+    pygame.draw.line(screen, color, start, end, width)
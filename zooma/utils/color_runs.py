@@ -0,0 +1,152 @@
+from bisect import bisect_right
+
+# Run-length encoded colors of a chain, e.g. [R, R, G, B, B, B] is stored as
+# colors [R, G, B] with lengths [2, 1, 3]. Colors are small integer ids from
+# zooma.utils.colors.get_color_id.
+
+class ColorRuns:
+    def __init__(self, color_ids: list[int] = ()):
+        self.colors: list[int] = []
+        self.lengths: list[int] = []
+        self.count = 0
+        self._starts: list[int] | None = None
+
+        for color_id in color_ids:
+            self.append(color_id)
+
+    def __len__(self):
+        """ Number of runs """
+        return len(self.colors)
+
+    def _get_starts(self) -> list[int]:
+        # Prefix sums are rebuilt lazily, once per batch of edits
+        if self._starts is None:
+            starts = []
+            total = 0
+            for length in self.lengths:
+                starts.append(total)
+                total += length
+            self._starts = starts
+        return self._starts
+
+    def run_at(self, index: int) -> int:
+        """ Index of the run holding ball index """
+        return bisect_right(self._get_starts(), index) - 1
+
+    def run_start(self, run: int) -> int:
+        return self._get_starts()[run]
+
+    def color_at(self, index: int) -> int:
+        return self.colors[self.run_at(index)]
+
+    def first_color(self) -> int | None:
+        return self.colors[0] if self.colors else None
+
+    def last_color(self) -> int | None:
+        return self.colors[-1] if self.colors else None
+
+    def match_at(self, index: int, color_id: int) -> tuple[int, int]:
+        """
+        Balls of color_id touching an insertion at index (between ball index - 1
+        and ball index). Returns (start, count), count is 0 if nothing matches.
+        """
+        for neighbour in (index, index - 1):
+            if 0 <= neighbour < self.count:
+                run = self.run_at(neighbour)
+                if self.colors[run] == color_id:
+                    return self.run_start(run), self.lengths[run]
+        return index, 0
+
+    def append(self, color_id: int):
+        if self.colors and self.colors[-1] == color_id:
+            self.lengths[-1] += 1
+        else:
+            self.colors.append(color_id)
+            self.lengths.append(1)
+        self.count += 1
+        self._starts = None
+
+    def insert(self, index: int, color_id: int):
+        """ Insert one ball of color_id so it becomes ball index """
+        if index >= self.count:
+            self.append(color_id)
+            return
+
+        run = self.run_at(index)
+        offset = index - self.run_start(run)
+
+        if self.colors[run] == color_id:
+            self.lengths[run] += 1
+        elif offset == 0 and run > 0 and self.colors[run - 1] == color_id:
+            self.lengths[run - 1] += 1
+        elif offset == 0:
+            self.colors.insert(run, color_id)
+            self.lengths.insert(run, 1)
+        else:
+            # Split the run around the new ball
+            tail = self.lengths[run] - offset
+            self.lengths[run] = offset
+            self.colors[run + 1:run + 1] = [color_id, self.colors[run]]
+            self.lengths[run + 1:run + 1] = [1, tail]
+
+        self.count += 1
+        self._starts = None
+
+    def remove(self, index: int, count: int = 1):
+        """ Remove count balls starting at ball index """
+        while count > 0:
+            run = self.run_at(index)
+            offset = index - self.run_start(run)
+            taken = min(count, self.lengths[run] - offset)
+            self.lengths[run] -= taken
+            self.count -= taken
+            count -= taken
+            self._starts = None
+
+            if self.lengths[run] == 0:
+                del self.colors[run]
+                del self.lengths[run]
+                self._merge_at(run)
+                self._starts = None
+
+    def _merge_at(self, run: int):
+        """ Join runs run - 1 and run if they are the same color """
+        if 0 < run < len(self.colors) and self.colors[run - 1] == self.colors[run]:
+            self.lengths[run - 1] += self.lengths[run]
+            del self.colors[run]
+            del self.lengths[run]
+
+    def split(self, index: int) -> "ColorRuns":
+        """ Cut off balls index onwards into a new ColorRuns """
+        tail = ColorRuns()
+        if index >= self.count:
+            return tail
+
+        run = self.run_at(index)
+        offset = index - self.run_start(run)
+
+        if offset == 0:
+            tail.colors = self.colors[run:]
+            tail.lengths = self.lengths[run:]
+            del self.colors[run:]
+            del self.lengths[run:]
+        else:
+            tail.colors = self.colors[run:]
+            tail.lengths = [self.lengths[run] - offset] + self.lengths[run + 1:]
+            del self.colors[run + 1:]
+            del self.lengths[run + 1:]
+            self.lengths[run] = offset
+
+        tail.count = self.count - index
+        self.count = index
+        self._starts = None
+        return tail
+
+    def extend(self, other: "ColorRuns"):
+        """ Append all runs of other to the end of this one """
+        join = len(self.colors)
+        self.colors.extend(other.colors)
+        self.lengths.extend(other.lengths)
+        self.count += other.count
+        self._merge_at(join)
+        self._starts = None
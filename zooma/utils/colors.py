@@ -1,5 +1,7 @@
+from array import array
 from pygame.color import Color
 import random
+import threading
 
 # generates colors for the game
 
@@ -22,31 +24,157 @@ DEFAULT_COLORS = [
     Color('Gainsboro')
 ]
 
+# Small integer ids for colors, so chains can compare ints instead of Color objects
+# The registry is shared by every game in the process. Ids only depend on
+# the color, so that is safe, and new colors are added under a lock.
+_color_ids: dict[tuple, int] = {}
+_id_colors: list[Color] = []
+_color_lock = threading.Lock()
+
+def get_color_id(color) -> int:
+    key = tuple(color)
+    color_id = _color_ids.get(key)
+    if color_id is None:
+        with _color_lock:
+            color_id = _color_ids.get(key)
+            if color_id is None:
+                color_id = len(_id_colors)
+                _id_colors.append(Color(color))
+                _color_ids[key] = color_id
+    return color_id
+
+def get_color_by_id(color_id: int) -> Color:
+    return _id_colors[color_id]
+
+# Default colors always get the same ids
+for _color in DEFAULT_COLORS:
+    get_color_id(_color)
+
 class LevelColors:
-    def __init__(self, difficulty: int, color_set: list[Color] = DEFAULT_COLORS):
+    def __init__(self, difficulty: int, color_set: list[Color] = DEFAULT_COLORS,
+                 rng: random.Random | None = None):
         self.colors = color_set[:difficulty]
-        self.color_cluster_sizes = [1, 2, 3]
-
-    def get_color(self):
-        return random.choice(self.colors)
+        self.color_cluster_sizes = (1, 2, 3)
+        # The game's random number generator, seeds the color sequences
+        self.rng = rng if rng is not None else random.Random()
+        # Changes with the colors, so sequences know to drop what they generated before
+        self.version = 0
 
     def set_colors(self, colors: list[Color]):
-        self.colors = colors
+        if colors != self.colors:
+            self.colors = colors
+            self.version += 1
 
     def set_difficulty(self, difficulty: int):
-        self.colors = DEFAULT_COLORS[:difficulty]
+        self.set_colors(DEFAULT_COLORS[:difficulty])
 
     def is_valid_color(self, color: Color):
         return color in self.colors
-        
-    def get_color_generator(self):
-        last_color = None
-        while True:
-            cluster_size = random.choice(self.color_cluster_sizes)
-            color = random.choice(self.colors)
-            if color == last_color:
-                continue
-            last_color = color
-            for _ in range(cluster_size):
-                yield color
-    
\ No newline at end of file
+
+    def get_color_sequence(self, cluster_sizes: tuple[int, ...] | None = None,
+                           avoid_repeats: bool = True) -> "ColorSequence":
+        return ColorSequence(self, self.rng.getrandbits(32), cluster_sizes or self.color_cluster_sizes,
+                             avoid_repeats)
+
+
+# Balls generated ahead of the draws
+SEQUENCE_CAPACITY = 64
+
+
+class ColorSequence:
+    """ Clusters of the same color, generated a batch at a time into a ring buffer.
+
+    With avoid_repeats a cluster is never the same color as the one before,
+    unless only one color is left. Each batch draws from its own random
+    number generator seeded by the sequence's seed and the batch number, so
+    a sequence doesn't depend on how its draws interleave with anything
+    else, and get_state() is just a few numbers and the buffered color ids.
+    """
+    def __init__(self, level_colors: LevelColors, seed: int, cluster_sizes: tuple[int, ...] = (1, 2, 3),
+                 avoid_repeats: bool = True, capacity: int = SEQUENCE_CAPACITY):
+        if capacity < max(cluster_sizes):
+            raise ValueError(f"Capacity {capacity} is smaller than a cluster")
+        self.level_colors = level_colors
+        self.seed = seed
+        self.cluster_sizes = tuple(cluster_sizes)
+        self.avoid_repeats = avoid_repeats
+        self.buffer = array('B', bytes(capacity))
+        # Index of the next color and how many are buffered from there
+        self.start = 0
+        self.count = 0
+        self.batches = 0
+        self.last_id: int | None = None
+        self.version = level_colors.version
+        self.max_lookahead = capacity - max(self.cluster_sizes) + 1
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Color:
+        return self.next_color()
+
+    def next_color(self) -> Color:
+        self._sync()
+        if self.count == 0:
+            self._refill()
+        color_id = self.buffer[self.start]
+        self.start = (self.start + 1) % len(self.buffer)
+        self.count -= 1
+        return get_color_by_id(color_id)
+
+    def peek(self, count: int = 1) -> list[Color]:
+        """ The next count colors without drawing them, up to max_lookahead """
+        if count > self.max_lookahead:
+            raise ValueError(f"Can look at most {self.max_lookahead} colors ahead")
+        self._sync()
+        if self.count < count:
+            self._refill()
+        capacity = len(self.buffer)
+        return [get_color_by_id(self.buffer[(self.start + i) % capacity]) for i in range(count)]
+
+    def _sync(self):
+        """ Drop colors generated from a palette that has since changed """
+        if self.version != self.level_colors.version:
+            self.version = self.level_colors.version
+            self.count = 0
+
+    def _refill(self):
+        """ Add whole clusters until the buffer is full """
+        color_ids = [get_color_id(color) for color in self.level_colors.colors]
+        if len(color_ids) == 0:
+            raise ValueError("No colors to generate from")
+        rng = random.Random((self.seed << 32) | self.batches)
+        self.batches += 1
+
+        buffer = self.buffer
+        capacity = len(buffer)
+        largest = max(self.cluster_sizes)
+        end = (self.start + self.count) % capacity
+        while capacity - self.count >= largest:
+            size = rng.choice(self.cluster_sizes)
+            if self.avoid_repeats and len(color_ids) > 1 and self.last_id in color_ids:
+                # Any color but the last, without drawing again
+                index = rng.randrange(len(color_ids) - 1)
+                if index >= color_ids.index(self.last_id):
+                    index += 1
+                color_id = color_ids[index]
+            else:
+                color_id = rng.choice(color_ids)
+            for _ in range(size):
+                buffer[end] = color_id
+                end = (end + 1) % capacity
+            self.count += size
+            self.last_id = color_id
+
+    def get_state(self) -> tuple:
+        capacity = len(self.buffer)
+        buffered = array('B', (self.buffer[(self.start + i) % capacity] for i in range(self.count)))
+        return (self.seed, self.batches, self.last_id, self.version == self.level_colors.version, buffered)
+
+    def set_state(self, state: tuple):
+        self.seed, self.batches, self.last_id, in_sync, buffered = state
+        self.buffer[:len(buffered)] = buffered
+        self.start = 0
+        self.count = len(buffered)
+        # Buffered for colors the level has since changed, drop them on the next draw
+        self.version = self.level_colors.version if in_sync else -1
@@ -0,0 +1,108 @@
+from typing import Callable
+
+from zooma.utils.log import get_logger
+
+log = get_logger(__name__)
+
+# A small synchronous event bus and the scheduler for the game's tasks.
+#
+# Chains, emitters, death holes and the game publish what changed. Each task
+# listens to the events that can change its outcome and runs on the next
+# pass of the scheduler after one is published, or every `every` ticks if it
+# has a cadence. Frames where nothing happened run no tasks at all.
+
+# Chains
+CHAIN_CREATED = "chain_created"
+BALLS_ADDED = "balls_added"
+BALLS_REMOVED = "balls_removed"
+CHAIN_EMPTIED = "chain_emptied"
+CHAIN_SPLIT = "chain_split"
+CHAIN_MERGED = "chain_merged"
+# Emitters
+EMITTER_STARTED = "emitter_started"
+EMITTER_STOPPED = "emitter_stopped"
+# Death holes
+HOLE_REACHED = "hole_reached"
+# Game
+PROGRESS_COMPLETE = "progress_complete"
+COLOR_EXHAUSTED = "color_exhausted"
+GAME_OVER = "game_over"
+
+
+class EventBus:
+    def __init__(self):
+        self.handlers: dict[str, list[Callable]] = {}
+        self.published: dict[str, int] = {}
+
+    def subscribe(self, event: str, handler: Callable):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def unsubscribe(self, event: str, handler: Callable):
+        handlers = self.handlers.get(event)
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+
+    def publish(self, event: str, *args):
+        """ Call every handler of event right away """
+        self.published[event] = self.published.get(event, 0) + 1
+        for handler in self.handlers.get(event, ()):
+            handler(*args)
+
+
+class ScheduledTask:
+    def __init__(self, name: str, run: Callable, every: int = 0):
+        self.name = name
+        self.run = run
+        # Ticks between runs without events, 0 to only run on events
+        self.every = every
+        # Run once when first scheduled
+        self.pending = True
+        self.last_run = 0
+        self.runs = 0
+
+    def wake(self, *args):
+        self.pending = True
+
+
+class TaskScheduler:
+    def __init__(self, events: EventBus):
+        self.events = events
+        self.tasks: list[ScheduledTask] = []
+        self.ticks = 0
+
+    def add(self, name: str, run: Callable, events: tuple[str, ...] = (), every: int = 0) -> ScheduledTask:
+        """ Run run(*args) on the ticks after any of events, tasks run in the order they were added """
+        task = ScheduledTask(name, run, every)
+        for event in events:
+            self.events.subscribe(event, task.wake)
+        self.tasks.append(task)
+        return task
+
+    def get(self, name: str) -> ScheduledTask | None:
+        for task in self.tasks:
+            if task.name == name:
+                return task
+        return None
+
+    def wake(self, name: str):
+        task = self.get(name)
+        if task is None:
+            log.warning("No task named %s", name)
+            return
+        task.pending = True
+
+    def wake_all(self):
+        """ Run every task on the next pass, e.g. after a level load or a restore """
+        for task in self.tasks:
+            task.pending = True
+
+    def run(self, *args):
+        self.ticks += 1
+        for task in self.tasks:
+            if not task.pending and not (task.every and self.ticks - task.last_run >= task.every):
+                continue
+            # Cleared first, so events the task publishes itself wake it again
+            task.pending = False
+            task.last_run = self.ticks
+            task.runs += 1
+            task.run(*args)
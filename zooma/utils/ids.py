@@ -0,0 +1,9 @@
+class IdAllocator:
+    """ Increasing ids, owned by one game so separate games never share a counter """
+    def __init__(self, next_id: int = 1):
+        self.next_id = next_id
+
+    def allocate(self) -> int:
+        allocated = self.next_id
+        self.next_id += 1
+        return allocated
@@ -0,0 +1,349 @@
+import argparse
+import json
+import math
+import os
+import random
+
+from zooma.utils.camera import SCREEN_WIDTH, SCREEN_HEIGHT
+from zooma.utils.level_validation import TURRET_RADIUS, BALL_RADIUS, validate_level, write_compiled_level
+from zooma.utils.spatial_grid import SpatialGrid
+
+# Procedural levels for scaling tests.
+#
+# Generates paths of a given shape with any number of points, evenly
+# spaced like editor drawn paths, and writes them in the editor's level
+# format with a levels.json listing them. Shapes:
+#
+#   spiral         arms winding in towards the turret
+#   serpentine     rows joined by half turns
+#   parallel       lanes side by side, snaking back and forth together
+#   near_crossing  a double spiral whose arms pass closer than a ball's width
+#
+# Levels larger than the window get a world size, see zooma.utils.camera.
+#
+#     python -m zooma.utils.level_generator --shapes spiral,serpentine --points 100,1000,10000,100000
+
+SPIRAL = "spiral"
+SERPENTINE = "serpentine"
+PARALLEL = "parallel"
+NEAR_CROSSING = "near_crossing"
+SHAPES = (SPIRAL, SERPENTINE, PARALLEL, NEAR_CROSSING)
+
+TURRET_CENTER = "center"
+TURRET_EDGE = "edge"
+TURRET_PLACEMENTS = (TURRET_CENTER, TURRET_EDGE)
+
+# Distance between points, the editor adds one at least every 20px
+POINT_SPACING = 10
+# Distance between neighbouring lanes, rows or turns, room for two balls
+LANE_GAP = 80
+# Arms of a near crossing path are closer than a ball's width
+NEAR_GAP = 30
+# Empty space around the paths
+MARGIN = 200
+DEFAULT_DIFFICULTY = 4
+GENERATED_DIR = "zooma/levels/generated"
+LEVELS_DIR = "zooma/levels"
+
+
+def _resample(points: list, spacing: float, count: int) -> list[tuple[float, float]]:
+    """ count points every spacing px along the polyline, fewer if it is too short """
+    resampled = [points[0]]
+    # Distance along the current segment to the next point
+    position = spacing
+    for a, b in zip(points, points[1:]):
+        length = math.hypot(b[0] - a[0], b[1] - a[1])
+        while position <= length and len(resampled) < count:
+            t = position / length
+            resampled.append((a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t))
+            position += spacing
+        if len(resampled) >= count:
+            break
+        position -= length
+    return resampled
+
+
+def _arc(center: tuple[float, float], radius: float, start: float, end: float, step: float) -> list:
+    steps = max(2, math.ceil(abs(end - start) * radius / step))
+    return [(center[0] + radius * math.cos(start + (end - start) * i / steps),
+             center[1] + radius * math.sin(start + (end - start) * i / steps)) for i in range(steps + 1)]
+
+
+def spiral_paths(points: int, paths: int = 1, spacing: float = POINT_SPACING, gap: float = LANE_GAP,
+                 rng: random.Random | None = None) -> list[list]:
+    """ paths interleaved arms around (0, 0), each running from the outside in """
+    rng = rng or random.Random()
+    length = (points - 1) * spacing
+    # Neighbouring turns of all the arms together are gap apart
+    growth = gap * paths / (2 * math.pi)
+    inner_radius = TURRET_RADIUS + BALL_RADIUS + gap
+    start_angle = rng.uniform(0, 2 * math.pi)
+    step = spacing / 4
+
+    arms = []
+    for arm in range(paths):
+        rotation = start_angle + 2 * math.pi * arm / paths
+        angle = 0.0
+        travelled = 0.0
+        dense = [(inner_radius * math.cos(rotation), inner_radius * math.sin(rotation))]
+        while travelled < length + spacing:
+            angle += step / (inner_radius + growth * angle)
+            radius = inner_radius + growth * angle
+            dense.append((radius * math.cos(angle + rotation), radius * math.sin(angle + rotation)))
+            travelled += step
+        dense.reverse()
+        arms.append(_resample(dense, spacing, points))
+    return arms
+
+
+def serpentine_path(points: int, spacing: float = POINT_SPACING, gap: float = LANE_GAP) -> list:
+    """ Rows gap apart joined by half turns, about as wide as it is tall """
+    length = (points - 1) * spacing
+    width = max(SCREEN_WIDTH / 2, math.sqrt(length * gap))
+    dense = []
+    y = 0.0
+    travelled = 0.0
+    forward = True
+    while True:
+        dense += [(0.0, y), (width, y)] if forward else [(width, y), (0.0, y)]
+        travelled += width
+        if travelled >= length + spacing:
+            break
+        travelled += math.pi * gap / 2
+        # Half turn to the next row
+        if forward:
+            dense += _arc((width, y + gap / 2), gap / 2, -math.pi / 2, math.pi / 2, spacing / 4)[1:-1]
+        else:
+            dense += _arc((0.0, y + gap / 2), gap / 2, -math.pi / 2, -3 * math.pi / 2, spacing / 4)[1:-1]
+        y += gap
+        forward = not forward
+    return _resample(dense, spacing, points)
+
+
+def parallel_paths(points: int, paths: int, spacing: float = POINT_SPACING, gap: float = LANE_GAP) -> list[list]:
+    """ Lanes gap apart snaking back and forth together, in alternating directions """
+    length = (points - 1) * spacing
+    # Rows of the bundle are a lane's gap apart too, so turns are concentric
+    row_height = (paths + 1) * gap
+    width = max(SCREEN_WIDTH / 2, math.sqrt(length * row_height))
+
+    lanes = []
+    for lane in range(paths):
+        dense = []
+        top = 0.0
+        travelled = 0.0
+        forward = True
+        while True:
+            y = top + (lane if forward else paths - 1 - lane) * gap
+            dense += [(0.0, y), (width, y)] if forward else [(width, y), (0.0, y)]
+            travelled += width
+            if travelled >= length + spacing:
+                break
+            # Lanes turn around a shared center, the outer ones in wider half turns
+            center_y = top + (row_height + (paths - 1) * gap) / 2
+            if forward:
+                radius = (paths - lane) * gap
+                dense += _arc((width, center_y), radius, -math.pi / 2, math.pi / 2, spacing / 4)[1:-1]
+            else:
+                radius = (lane + 1) * gap
+                dense += _arc((0.0, center_y), radius, -math.pi / 2, -3 * math.pi / 2, spacing / 4)[1:-1]
+            travelled += math.pi * radius
+            top += row_height
+            forward = not forward
+        lane_points = _resample(dense, spacing, points)
+        if lane % 2 == 1:
+            lane_points.reverse()
+        lanes.append(lane_points)
+    return lanes
+
+
+def near_crossing_path(points: int, spacing: float = POINT_SPACING, gap: float = NEAR_GAP) -> list:
+    """ A double spiral, in along one arm and out along the other, arms gap apart """
+    # Each arm is the other turned half way round, so arms sit half a turn's growth apart
+    growth = 2 * gap / (2 * math.pi)
+    inner_angle = 2 * math.pi
+    step = spacing / 4
+    arm_length = (points - 1) * spacing / 2
+
+    angle = inner_angle
+    travelled = 0.0
+    arm = []
+    while travelled < arm_length + spacing:
+        radius = growth * angle
+        arm.append((radius * math.cos(angle), radius * math.sin(angle)))
+        angle += step / radius
+        travelled += step
+    # In along the mirrored arm, through the middle, out along the arm
+    dense = [(-x, -y) for x, y in reversed(arm)] + arm
+    return _resample(dense, spacing, points)
+
+
+def _tile(shapes: list[list], gap: float) -> list[list]:
+    """ Lay copies of a shape out in a grid, gap apart """
+    columns = math.ceil(math.sqrt(len(shapes)))
+    tiled = []
+    cursor_x = cursor_y = row_height = 0.0
+    for i, points in enumerate(shapes):
+        min_x = min(x for x, _ in points)
+        min_y = min(y for _, y in points)
+        width = max(x for x, _ in points) - min_x
+        height = max(y for _, y in points) - min_y
+        if i > 0 and i % columns == 0:
+            cursor_x = 0.0
+            cursor_y += row_height + gap
+            row_height = 0.0
+        tiled.append([(x - min_x + cursor_x, y - min_y + cursor_y) for x, y in points])
+        cursor_x += width + gap
+        row_height = max(row_height, height)
+    return tiled
+
+
+def _place_turret(paths: list[list], world_size: tuple[int, int], preferred: tuple[float, float],
+                  spacing: float) -> tuple[float, float] | None:
+    """ Free spot closest to preferred, searching outwards in rings """
+    # Points are at most spacing apart, so staying this far from every point
+    # keeps the turret clear of the segments between them
+    clearance = TURRET_RADIUS + BALL_RADIUS + spacing
+    grid = SpatialGrid(clearance)
+    for points in paths:
+        for x, y in points:
+            grid.insert((x, y), x, y, x, y)
+
+    width, height = world_size
+
+    def is_free(x: float, y: float) -> bool:
+        if not (TURRET_RADIUS <= x <= width - TURRET_RADIUS and TURRET_RADIUS <= y <= height - TURRET_RADIUS):
+            return False
+        for px, py in grid.query_rect(x - clearance, y - clearance, x + clearance, y + clearance):
+            if math.hypot(px - x, py - y) < clearance:
+                return False
+        return True
+
+    step = BALL_RADIUS
+    for ring in range(int(math.hypot(width, height) / step) + 1):
+        radius = ring * step
+        count = max(1, math.ceil(2 * math.pi * radius / step))
+        for i in range(count):
+            angle = 2 * math.pi * i / count
+            x = preferred[0] + radius * math.cos(angle)
+            y = preferred[1] + radius * math.sin(angle)
+            if is_free(x, y):
+                return x, y
+    return None
+
+
+def generate_level(shape: str, points: int = 1000, paths: int = 1, turret: str = TURRET_CENTER,
+                   spacing: float = POINT_SPACING, gap: float | None = None, seed: int | None = None) -> dict:
+    """ Level data in the editor's format, with points points on each of paths paths """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape {shape}, expected one of {SHAPES}")
+    if turret not in TURRET_PLACEMENTS:
+        raise ValueError(f"Unknown turret placement {turret}, expected one of {TURRET_PLACEMENTS}")
+    if points < 2 or paths < 1:
+        raise ValueError("A level needs at least one path of at least 2 points")
+    rng = random.Random(seed)
+
+    if shape == SPIRAL:
+        shapes = spiral_paths(points, paths, spacing, gap or LANE_GAP, rng)
+    elif shape == PARALLEL:
+        shapes = parallel_paths(points, paths, spacing, gap or LANE_GAP)
+    elif shape == SERPENTINE:
+        shapes = _tile([serpentine_path(points, spacing, gap or LANE_GAP) for _ in range(paths)], LANE_GAP)
+    else:
+        shapes = _tile([near_crossing_path(points, spacing, gap or NEAR_GAP) for _ in range(paths)], LANE_GAP)
+
+    # Center everything in a world with MARGIN to spare
+    min_x = min(x for points in shapes for x, _ in points)
+    min_y = min(y for points in shapes for _, y in points)
+    max_x = max(x for points in shapes for x, _ in points)
+    max_y = max(y for points in shapes for _, y in points)
+    world_size = (max(SCREEN_WIDTH, math.ceil(max_x - min_x + 2 * MARGIN)),
+                  max(SCREEN_HEIGHT, math.ceil(max_y - min_y + 2 * MARGIN)))
+    shift_x = (world_size[0] - (max_x - min_x)) / 2 - min_x
+    shift_y = (world_size[1] - (max_y - min_y)) / 2 - min_y
+    shapes = [[(round(x + shift_x), round(y + shift_y)) for x, y in points] for points in shapes]
+
+    if turret == TURRET_CENTER:
+        preferred = (world_size[0] / 2, world_size[1] / 2)
+    else:
+        preferred = (world_size[0] / 2, world_size[1] - MARGIN / 2)
+    position = _place_turret(shapes, world_size, preferred, spacing)
+    if position is None:
+        raise ValueError(f"No room for the turret in a {shape} level")
+
+    data = {
+        "paths": [{"points": [[x, y] for x, y in points]} for points in shapes],
+        "turret": {"position": [round(position[0]), round(position[1])]},
+    }
+    if world_size != (SCREEN_WIDTH, SCREEN_HEIGHT):
+        data["world"] = {"size": list(world_size)}
+    return data
+
+
+def get_level_entry(name: str, map_filename: str, difficulty: int = DEFAULT_DIFFICULTY,
+                    chain_length: int | None = None) -> dict:
+    """ levels.json entry for a map file, chain_length caps the balls each emitter sends """
+    entry = {
+        "name": name,
+        "map": os.path.relpath(map_filename, LEVELS_DIR).replace(os.sep, "/"),
+        "difficulty": difficulty,
+    }
+    if chain_length is not None:
+        entry["chain_length"] = chain_length
+    return entry
+
+
+def write_level(directory: str, name: str, data: dict) -> str:
+    """ Write a level and its compiled paths, returns the level's filename """
+    os.makedirs(directory, exist_ok=True)
+    filename = os.path.join(directory, f"{name}.json")
+    with open(filename, "w") as f:
+        json.dump(data, f)
+    write_compiled_level(filename, data)
+    return filename
+
+
+def write_levels_file(directory: str, entries: list[dict]) -> str:
+    filename = os.path.join(directory, "levels.json")
+    with open(filename, "w") as f:
+        json.dump({"levels": entries}, f, indent=4)
+    return filename
+
+
+def _int_list(text: str) -> list[int]:
+    return [int(value) for value in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate levels for scaling tests")
+    parser.add_argument("--shapes", default=",".join(SHAPES), help="comma separated, from " + ", ".join(SHAPES))
+    parser.add_argument("--points", type=_int_list, default=[100, 1000, 10000], help="points per path, comma separated")
+    parser.add_argument("--paths", type=_int_list, default=[1], help="paths per level, comma separated")
+    parser.add_argument("--turret", choices=TURRET_PLACEMENTS, default=TURRET_CENTER)
+    parser.add_argument("--chain-length", type=int, default=None, help="balls each emitter sends")
+    parser.add_argument("--difficulty", type=int, default=DEFAULT_DIFFICULTY)
+    parser.add_argument("--gap", type=float, default=None, help="distance between lanes or turns")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=GENERATED_DIR, help="directory under zooma/levels")
+    args = parser.parse_args()
+
+    entries = []
+    for shape in args.shapes.split(","):
+        for paths in args.paths:
+            for points in args.points:
+                name = f"{shape}-{points}x{paths}"
+                data = generate_level(shape, points, paths, args.turret, gap=args.gap, seed=args.seed)
+                report = validate_level(data)
+                print(name)
+                print(report.summary())
+                if not report.is_valid():
+                    print("Not written")
+                    continue
+                filename = write_level(args.out, name, data)
+                entries.append(get_level_entry(name, filename, args.difficulty, args.chain_length))
+
+    print("Wrote", write_levels_file(args.out, entries))
+
+
+if __name__ == "__main__":
+    main()
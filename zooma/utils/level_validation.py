@@ -0,0 +1,214 @@
+import hashlib
+import json
+import math
+import os
+import sys
+from dataclasses import dataclass, field
+
+from zooma.utils.path_compiler import compile_path, distance_to_segment, DEFAULT_TOLERANCE
+from zooma.utils.spatial_grid import SpatialGrid
+from zooma.utils.camera import get_world_size
+
+# Checks a level before it ships: turret placement, paths crossing
+# themselves or leaving the world, and a rough estimate of how much
+# path work the level costs every frame. Also writes the compiled paths
+# the game loads next to the level file.
+
+TURRET_RADIUS = 40
+BALL_RADIUS = 20
+COMPILED_SUFFIX = ".compiled.json"
+
+# Rough per frame budget of path segment tests before a level is flagged
+MAX_QUERY_COST = 5000
+# Path queries each ball causes per frame (movement, gaps, chain ordering)
+QUERIES_PER_BALL = 3
+
+
+@dataclass
+class PathStats:
+    point_count: int
+    compiled_point_count: int
+    arc_length: float
+    max_balls: int
+    query_cost: int
+
+
+@dataclass
+class LevelReport:
+    errors: list[str] = field(default_factory=list)
+    warnings: list[str] = field(default_factory=list)
+    paths: list[PathStats] = field(default_factory=list)
+
+    def is_valid(self) -> bool:
+        return len(self.errors) == 0
+
+    def summary(self) -> str:
+        lines = []
+        for i, stats in enumerate(self.paths):
+            lines.append(f"Path {i}: {stats.point_count} points ({stats.compiled_point_count} compiled), "
+                         f"length {stats.arc_length:.0f}px, up to {stats.max_balls} balls, "
+                         f"~{stats.query_cost} segment tests per frame")
+        lines += [f"ERROR: {error}" for error in self.errors]
+        lines += [f"WARNING: {warning}" for warning in self.warnings]
+        return "\n".join(lines)
+
+
+def _cross(o, a, b) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def _segments_intersect(a, b, c, d) -> bool:
+    d1 = _cross(c, d, a)
+    d2 = _cross(c, d, b)
+    d3 = _cross(a, b, c)
+    d4 = _cross(a, b, d)
+    return ((d1 > 0) != (d2 > 0) and d1 != 0 and d2 != 0 and
+            (d3 > 0) != (d4 > 0) and d3 != 0 and d4 != 0)
+
+
+def find_self_intersections(points: list) -> list[tuple[int, int]]:
+    """ Pairs of non-adjacent segments that cross, found through a grid """
+    grid = SpatialGrid(40)
+    crossings = []
+    for i in range(len(points) - 1):
+        a = points[i]
+        b = points[i + 1]
+        box = (min(a[0], b[0]), min(a[1], b[1]), max(a[0], b[0]), max(a[1], b[1]))
+        for j in sorted(grid.query_rect(*box)):
+            if j >= i - 1:
+                continue
+            if _segments_intersect(a, b, points[j], points[j + 1]):
+                crossings.append((j, i))
+        grid.insert(i, *box)
+    return crossings
+
+
+def _arc_length(points: list) -> float:
+    return sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(points, points[1:]))
+
+
+def _query_cost(points: list) -> tuple[int, int]:
+    """ Estimated balls on the path and segment tests per frame """
+    max_balls = int(_arc_length(points) / (BALL_RADIUS * 2))
+
+    # Segments a nearest segment query typically has to look at
+    grid = SpatialGrid(25)
+    for a, b in zip(points, points[1:]):
+        grid.insert(None, min(a[0], b[0]), min(a[1], b[1]), max(a[0], b[0]), max(a[1], b[1]))
+    cells = grid.cells.values()
+    per_cell = sum(len(items) for items in cells) / max(1, len(cells))
+    segments_per_query = math.ceil(per_cell * 4)
+
+    return max_balls, max_balls * QUERIES_PER_BALL * segments_per_query
+
+
+def validate_level(data: dict, tolerance: float = DEFAULT_TOLERANCE) -> LevelReport:
+    report = LevelReport()
+
+    paths = data.get("paths", [])
+    if len(paths) == 0:
+        report.errors.append("Level has no paths")
+
+    width, height = get_world_size(data)
+    turret = data.get("turret")
+    turret_position = None
+    if turret is None or "position" not in turret:
+        report.errors.append("Level has no turret")
+    else:
+        turret_position = turret["position"]
+        x, y = turret_position
+        if not (TURRET_RADIUS <= x <= width - TURRET_RADIUS and TURRET_RADIUS <= y <= height - TURRET_RADIUS):
+            report.errors.append(f"Turret at {turret_position} is not fully inside {width}x{height}")
+
+    total_cost = 0
+    for i, path in enumerate(paths):
+        points = path.get("points", [])
+        if len(points) < 2:
+            report.errors.append(f"Path {i} has fewer than 2 points")
+            continue
+
+        outside = [p for p in points if not (0 < p[0] < width and 0 < p[1] < height)]
+        if outside:
+            report.errors.append(f"Path {i} has {len(outside)} points outside {width}x{height}, "
+                                 f"first at {outside[0]}")
+
+        # Crossings can be on purpose, but balls pass through each other there
+        crossings = find_self_intersections(points)
+        if crossings:
+            report.warnings.append(f"Path {i} crosses itself {len(crossings)} times, "
+                                   f"first between points {crossings[0][0]} and {crossings[0][1]}")
+
+        if turret_position is not None:
+            clearance = min(distance_to_segment(turret_position, a, b) for a, b in zip(points, points[1:]))
+            if clearance < TURRET_RADIUS + BALL_RADIUS:
+                report.errors.append(f"Path {i} passes {clearance:.0f}px from the turret, "
+                                     f"needs {TURRET_RADIUS + BALL_RADIUS}px")
+
+        compiled = compile_path(points, tolerance)
+        max_balls, query_cost = _query_cost(compiled)
+        total_cost += query_cost
+        report.paths.append(PathStats(len(points), len(compiled), _arc_length(points), max_balls, query_cost))
+
+    if total_cost > MAX_QUERY_COST:
+        report.warnings.append(f"Estimated {total_cost} segment tests per frame, budget is {MAX_QUERY_COST}")
+
+    return report
+
+
+def get_source_hash(data: dict) -> str:
+    """ Hash of a level's drawn paths, a compiled level is stale when it doesn't match """
+    paths = [path.get("points", []) for path in data.get("paths", [])]
+    return hashlib.sha1(json.dumps(paths, separators=(",", ":")).encode()).hexdigest()
+
+
+def compile_level(data: dict, tolerance: float = DEFAULT_TOLERANCE) -> dict:
+    """ Runtime version of a level with compiled paths """
+    compiled = {"tolerance": tolerance, "source": get_source_hash(data), "paths": []}
+    for path in data.get("paths", []):
+        points = compile_path(path.get("points", []), tolerance)
+        compiled["paths"].append({
+            "points": [[round(x, 2), round(y, 2)] for x, y in points],
+            "length": round(_arc_length(points), 2),
+        })
+    if "turret" in data:
+        compiled["turret"] = data["turret"]
+    return compiled
+
+
+def get_compiled_filename(filename: str) -> str:
+    root, _ = os.path.splitext(filename)
+    return root + COMPILED_SUFFIX
+
+
+def write_compiled_level(filename: str, data: dict, tolerance: float = DEFAULT_TOLERANCE) -> str:
+    compiled_filename = get_compiled_filename(filename)
+    with open(compiled_filename, "w") as f:
+        json.dump(compile_level(data, tolerance), f)
+    return compiled_filename
+
+
+def main():
+    """ Check level files: python -m zooma.utils.level_validation [--write] files... """
+    write = "--write" in sys.argv
+    filenames = [arg for arg in sys.argv[1:] if arg != "--write" and not arg.endswith(COMPILED_SUFFIX)]
+
+    failed = False
+    for filename in filenames:
+        with open(filename, "r") as f:
+            data = json.load(f)
+        if "paths" not in data:
+            # levels.json and other files next to the maps
+            print(filename, "is not a level map, skipped")
+            continue
+        report = validate_level(data)
+        print(filename)
+        print(report.summary())
+        failed = failed or not report.is_valid()
+        if write and report.is_valid():
+            print("Wrote", write_compiled_level(filename, data))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import atexit
+import logging
+import os
+import sys
+
+# Logging setup for the game. Modules log through get_logger(__name__) and
+# always use lazy %-style arguments, so a disabled level costs one cached
+# isEnabledFor check and no string formatting.
+#
+# Levels can be set per module, either in code or with the ZOOMA_LOG
+# environment variable:
+#     ZOOMA_LOG=debug                                  everything at debug
+#     ZOOMA_LOG=info,zooma.entities.chain=debug        per module overrides
+# ZOOMA_LOG_FILE=zooma.log sends records through a queue to a background
+# thread that writes the file, so the game loop never blocks on disk.
+
+ROOT_LOGGER = "zooma"
+DEFAULT_LEVEL = logging.INFO
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# logging.handlers.QueueListener, only imported when logging to a file
+_listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def parse_level(name: str) -> int | None:
+    """ Level number for a name like "debug", None if there is no such level """
+    level = logging.getLevelName(name.strip().upper())
+    # Unknown names come back as the string "Level NAME"
+    return level if isinstance(level, int) else None
+
+
+def parse_levels(spec: str) -> tuple[int | None, dict[str, int]]:
+    """ Parse "info,zooma.main=debug" into a default level and module levels
+
+    Entries with an unknown level are skipped with a warning.
+    """
+    default_level = None
+    module_levels = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, level_name = part.rpartition("=")
+        level = parse_level(level_name)
+        if level is None:
+            get_logger(__name__).warning("Ignoring %r in ZOOMA_LOG, unknown level %r", part, level_name)
+        elif name:
+            module_levels[name.strip()] = level
+        else:
+            default_level = level
+    return default_level, module_levels
+
+
+def configure_logging(level: int = DEFAULT_LEVEL,
+                      module_levels: dict[str, int] | None = None,
+                      log_file: str | None = None,
+                      use_queue: bool = True):
+    """ Set up console or file logging for the zooma package """
+    global _listener
+    stop_logging()
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers.clear()
+    root.setLevel(level)
+    root.propagate = False
+
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    if log_file is None:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        return
+
+    from logging.handlers import QueueHandler, QueueListener
+    import queue
+
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    if not use_queue:
+        root.addHandler(file_handler)
+        return
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, file_handler)
+    _listener.start()
+
+
+def configure_from_env():
+    """ Configure logging from ZOOMA_LOG and ZOOMA_LOG_FILE """
+    default_level, module_levels = parse_levels(os.environ.get("ZOOMA_LOG", ""))
+    configure_logging(level=default_level if default_level is not None else DEFAULT_LEVEL,
+                      module_levels=module_levels,
+                      log_file=os.environ.get("ZOOMA_LOG_FILE"))
+
+
+def stop_logging():
+    """ Flush and stop the background file writer if there is one """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
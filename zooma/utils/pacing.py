@@ -0,0 +1,135 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+
+# Frame pacing and latency measurement.
+#
+# FramePacer holds a loop to a target rate with perf_counter_ns. It sleeps
+# until shortly before the deadline, since sleep can overshoot by a
+# scheduler slice, then spins for the rest. It keeps every frame interval
+# for a jitter report. LatencyTracker stamps input events when the game
+# polls them and measures how long it takes until the display flip that
+# shows their effect.
+
+# Spin instead of sleeping for the last part of a frame
+SPIN_NS = 1_000_000
+# Intervals and latencies kept for reports
+HISTORY = 36_000
+
+
+def percentile(sorted_values: list[int], fraction: float) -> int:
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+@dataclass
+class TimingReport:
+    count: int
+    mean_ms: float
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+
+    def __str__(self):
+        return (f"{self.count} samples, mean {self.mean_ms:.2f} ms, p50 {self.p50_ms:.2f} ms, "
+                f"p99 {self.p99_ms:.2f} ms, max {self.max_ms:.2f} ms")
+
+
+def get_timing_report(values_ns) -> TimingReport:
+    values = sorted(values_ns)
+    if not values:
+        return TimingReport(0, 0.0, 0.0, 0.0, 0.0)
+    return TimingReport(len(values), sum(values) / len(values) / 1e6,
+                        percentile(values, 0.5) / 1e6, percentile(values, 0.99) / 1e6, values[-1] / 1e6)
+
+
+class FramePacer:
+    def __init__(self, rate: float, spin_ns: int = SPIN_NS, history: int = HISTORY):
+        self.spin_ns = spin_ns
+        self.set_rate(rate)
+        self.intervals: deque[int] = deque(maxlen=history)
+        self.last_frame_ns: int | None = None
+        self.next_frame_ns: int | None = None
+        # Frames that started more than half a period late
+        self.late_frames = 0
+
+    def set_rate(self, rate: float):
+        self.rate = rate
+        self.period_ns = int(1e9 / rate)
+
+    def wait(self) -> int:
+        """ Wait for the start of the next frame, returns the length of the frame that just ended in ns """
+        now = time.perf_counter_ns()
+        if self.next_frame_ns is None:
+            self.next_frame_ns = now
+        self.next_frame_ns += self.period_ns
+
+        remaining = self.next_frame_ns - now
+        if remaining > self.spin_ns:
+            time.sleep((remaining - self.spin_ns) / 1e9)
+        while time.perf_counter_ns() < self.next_frame_ns:
+            pass
+
+        now = time.perf_counter_ns()
+        if now - self.next_frame_ns > self.period_ns // 2:
+            self.late_frames += 1
+            # Behind schedule, start over from now rather than rushing frames to catch up
+            self.next_frame_ns = now
+
+        interval = 0
+        if self.last_frame_ns is not None:
+            interval = now - self.last_frame_ns
+            self.intervals.append(interval)
+        self.last_frame_ns = now
+        return interval
+
+    def get_report(self) -> TimingReport:
+        return get_timing_report(self.intervals)
+
+    def get_jitter_ms(self) -> float:
+        """ Mean distance of frame lengths from the target period """
+        if not self.intervals:
+            return 0.0
+        return sum(abs(interval - self.period_ns) for interval in self.intervals) / len(self.intervals) / 1e6
+
+    def format_report(self) -> str:
+        return (f"target {self.period_ns / 1e6:.2f} ms ({self.rate:g} fps), frames {self.get_report()}, "
+                f"jitter {self.get_jitter_ms():.3f} ms, late {self.late_frames}")
+
+
+class LatencyTracker:
+    def __init__(self, history: int = HISTORY):
+        self.history = history
+        # (kind, poll time, seq) of inputs whose effect hasn't been shown yet
+        self.pending: list[tuple[str, int, int]] = []
+        self.samples: dict[str, deque[int]] = {}
+
+    def stamp(self, kind: str, seq: int = 0):
+        """ An input of kind was just polled, seq numbers inputs handled elsewhere """
+        self.pending.append((kind, time.perf_counter_ns(), seq))
+
+    def flipped(self, shown_seq: int | None = None):
+        """ A frame is on screen, showing every pending input or those up to shown_seq """
+        if not self.pending:
+            return
+        now = time.perf_counter_ns()
+        waiting = []
+        for kind, polled, seq in self.pending:
+            if shown_seq is not None and seq > shown_seq:
+                waiting.append((kind, polled, seq))
+                continue
+            samples = self.samples.get(kind)
+            if samples is None:
+                samples = self.samples[kind] = deque(maxlen=self.history)
+            samples.append(now - polled)
+        self.pending = waiting
+
+    def get_report(self, kind: str) -> TimingReport:
+        return get_timing_report(self.samples.get(kind, ()))
+
+    def format_report(self) -> str:
+        if not self.samples:
+            return "no input"
+        return "; ".join(f"{kind}: {self.get_report(kind)}" for kind in sorted(self.samples))
@@ -0,0 +1,108 @@
+import math
+
+# Turns the dense, unevenly spaced point lists drawn in the editor into
+# compact paths for the game. Straight runs collapse into a few long segments
+# while tight curves keep as many points as they need to stay within the
+# error tolerance. Optionally a Catmull-Rom spline is fitted through the
+# points first and sampled at even arc length, which smooths hand jitter.
+
+DEFAULT_TOLERANCE = 1.0
+
+
+def distance_to_segment(p, a, b) -> float:
+    """ Distance from point p to the segment a-b """
+    abx = b[0] - a[0]
+    aby = b[1] - a[1]
+    length_squared = abx * abx + aby * aby
+    if length_squared == 0:
+        return math.hypot(p[0] - a[0], p[1] - a[1])
+    t = ((p[0] - a[0]) * abx + (p[1] - a[1]) * aby) / length_squared
+    t = max(0, min(1, t))
+    return math.hypot(p[0] - (a[0] + abx * t), p[1] - (a[1] + aby * t))
+
+
+def simplify(points: list, tolerance: float = DEFAULT_TOLERANCE) -> list[tuple[float, float]]:
+    """ Ramer-Douglas-Peucker: drop points while staying within tolerance of the original """
+    points = [(float(p[0]), float(p[1])) for p in points]
+    if len(points) < 3:
+        return points
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        worst_distance = 0
+        worst_index = None
+        for i in range(start + 1, end):
+            distance = distance_to_segment(points[i], points[start], points[end])
+            if distance > worst_distance:
+                worst_distance = distance
+                worst_index = i
+
+        if worst_index is not None and worst_distance > tolerance:
+            keep[worst_index] = True
+            stack.append((start, worst_index))
+            stack.append((worst_index, end))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def _catmull_rom(p0, p1, p2, p3, t: float) -> tuple[float, float]:
+    t2 = t * t
+    t3 = t2 * t
+    return tuple(
+        0.5 * (2 * p1[i] + (p2[i] - p0[i]) * t
+               + (2 * p0[i] - 5 * p1[i] + 4 * p2[i] - p3[i]) * t2
+               + (3 * p1[i] - p0[i] - 3 * p2[i] + p3[i]) * t3)
+        for i in (0, 1)
+    )
+
+
+def fit_spline(points: list, spacing: float = 10, samples_per_segment: int = 8) -> list[tuple[float, float]]:
+    """ Catmull-Rom spline through points, resampled every spacing pixels of arc length """
+    points = [(float(p[0]), float(p[1])) for p in points]
+    if len(points) < 3:
+        return points
+
+    # Dense polyline along the spline
+    padded = [points[0]] + points + [points[-1]]
+    dense = [points[0]]
+    for i in range(1, len(padded) - 2):
+        for step in range(1, samples_per_segment + 1):
+            dense.append(_catmull_rom(padded[i - 1], padded[i], padded[i + 1], padded[i + 2],
+                                      step / samples_per_segment))
+
+    # Walk the polyline and drop a point every spacing pixels
+    resampled = [dense[0]]
+    carried = 0
+    for a, b in zip(dense, dense[1:]):
+        segment_length = math.hypot(b[0] - a[0], b[1] - a[1])
+        position = spacing - carried
+        while position <= segment_length:
+            t = position / segment_length
+            resampled.append((a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t))
+            position += spacing
+        carried = (carried + segment_length) % spacing
+
+    if resampled[-1] != dense[-1]:
+        resampled.append(dense[-1])
+    return resampled
+
+
+def compile_path(points: list, tolerance: float = DEFAULT_TOLERANCE,
+                 spline_spacing: float | None = None) -> list[tuple[float, float]]:
+    """ Compact runtime version of an editor path """
+    if spline_spacing is not None:
+        points = fit_spline(points, spline_spacing)
+    return simplify(points, tolerance)
+
+
+def max_error(original: list, compiled: list) -> float:
+    """ Largest distance from an original point to the compiled polyline """
+    worst = 0
+    for p in original:
+        best = min(distance_to_segment(p, a, b) for a, b in zip(compiled, compiled[1:]))
+        worst = max(worst, best)
+    return worst
@@ -0,0 +1,57 @@
+from zooma.entities.ball import ChainBall, HeldBall, ShotBall
+from zooma.entities.chain import BallRecord
+
+# Free lists for the objects the game makes and drops every few frames:
+# shot balls, the forg's held balls, chain balls and their records.
+# acquire() hands back a released object reset with the given arguments, or
+# builds a new one when the pool is empty. Anything released must no longer
+# be referenced by the game.
+
+DEFAULT_MAX_SIZE = 512
+
+
+class ObjectPool:
+    def __init__(self, factory, max_size: int = DEFAULT_MAX_SIZE):
+        self.factory = factory
+        self.max_size = max_size
+        self.free = []
+        self.created = 0
+        self.reused = 0
+
+    def __len__(self):
+        return len(self.free)
+
+    def acquire(self, *args):
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args)
+            obj.pooled = False
+            self.reused += 1
+            return obj
+
+        obj = self.factory(*args)
+        obj.pooled = False
+        self.created += 1
+        return obj
+
+    def release(self, obj):
+        # Releasing twice would hand the same object out to two owners
+        if getattr(obj, "pooled", False):
+            return
+        obj.pooled = True
+        if len(self.free) < self.max_size:
+            self.free.append(obj)
+
+
+class BallPools:
+    """ One set of pools per game """
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        self.shot_balls = ObjectPool(ShotBall, max_size)
+        self.held_balls = ObjectPool(HeldBall, max_size)
+        self.chain_balls = ObjectPool(ChainBall, max_size)
+        self.records = ObjectPool(BallRecord, max_size)
+
+    def release_record(self, record: BallRecord):
+        """ Release a chain record together with its ball """
+        self.chain_balls.release(record.ball)
+        self.records.release(record)
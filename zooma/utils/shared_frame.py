@@ -0,0 +1,172 @@
+import struct
+from array import array
+from multiprocessing import shared_memory
+
+from zooma.utils.log import get_logger
+
+log = get_logger(__name__)
+
+# What the renderer needs to draw one tick, in a double buffer in shared memory.
+#
+# The writer fills the slot the reader is not looking at, then publishes it
+# as the newest. Each slot has a sequence number that is odd while it is
+# being written, so a reader that was overtaken by two writes can tell and
+# read again. Readers get memoryviews straight into the buffer, nothing is
+# copied. Level geometry never changes during a level, the renderer loads
+# it from the level files.
+
+MAX_BALLS = 2048
+MAX_SHOTS = 64
+NO_COLOR = -1
+
+# Flags
+PAUSED = 1
+LEVEL_COMPLETE = 2
+GAME_OVER = 4
+SHOW_GAME_OVER = 8
+FORG_DEAD = 16
+
+MESSAGE_BYTES = 64
+
+# Index of the newest complete slot, -1 before the first write
+_header = struct.Struct("q")
+# seq, tick, input seq, level, score, progress, flags, heading x, heading y, held, reserve, balls, shots, message
+_slot_header = struct.Struct(f"qqqiififfiiii{MESSAGE_BYTES}s")
+_slot_header_size = (_slot_header.size + 7) // 8 * 8
+
+
+def _slot_size(max_balls: int, max_shots: int) -> int:
+    # Positions are float32 pairs, colors int16 color ids
+    size = _slot_header_size + (max_balls + max_shots) * 8 + (max_balls + max_shots) * 2
+    return (size + 7) // 8 * 8
+
+
+class FrameView:
+    """ One slot of the buffer, valid until is_current() turns False """
+    def __init__(self, buffer: "SharedFrameBuffer", slot: int, seq: int, values: tuple):
+        self.buffer = buffer
+        self.slot = slot
+        self.seq = seq
+        (_, self.tick, self.input_seq, self.level, self.score, self.progress, self.flags, self.heading_x, self.heading_y,
+         self.held_color, self.reserve_color, self.ball_count, self.shot_count, message) = values
+        self.message = message.rstrip(b"\0").decode("utf-8", "replace")
+
+        offsets = buffer.offsets(slot)
+        buf = buffer.shm.buf
+        self.ball_positions = buf[offsets[0]:offsets[0] + self.ball_count * 8].cast('f')
+        self.shot_positions = buf[offsets[1]:offsets[1] + self.shot_count * 8].cast('f')
+        self.ball_colors = buf[offsets[2]:offsets[2] + self.ball_count * 2].cast('h')
+        self.shot_colors = buf[offsets[3]:offsets[3] + self.shot_count * 2].cast('h')
+
+    def has_flag(self, flag: int) -> bool:
+        return bool(self.flags & flag)
+
+    def is_current(self) -> bool:
+        """ False once the writer has started reusing this slot """
+        return self.buffer.get_seq(self.slot) == self.seq
+
+    def release(self):
+        """ Drop the views into shared memory, needed before the buffer is closed """
+        for view in (self.ball_positions, self.shot_positions, self.ball_colors, self.shot_colors):
+            view.release()
+
+
+class SharedFrameBuffer:
+    def __init__(self, name: str | None = None, max_balls: int = MAX_BALLS, max_shots: int = MAX_SHOTS):
+        """ Create a new buffer, or attach to the one called name """
+        self.max_balls = max_balls
+        self.max_shots = max_shots
+        self.slot_size = _slot_size(max_balls, max_shots)
+        size = _header.size + self.slot_size * 2
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            _header.pack_into(self.shm.buf, 0, -1)
+            for slot in range(2):
+                _slot_header.pack_into(self.shm.buf, self._slot_start(slot), 0, 0, 0, 0, 0, 0.0, 0, 0.0, 0.0,
+                                       NO_COLOR, NO_COLOR, 0, 0, b"")
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.truncated = 0
+
+    def _slot_start(self, slot: int) -> int:
+        return _header.size + slot * self.slot_size
+
+    def offsets(self, slot: int) -> tuple[int, int, int, int]:
+        """ Start of ball positions, shot positions, ball colors and shot colors in slot """
+        ball_positions = self._slot_start(slot) + _slot_header_size
+        shot_positions = ball_positions + self.max_balls * 8
+        ball_colors = shot_positions + self.max_shots * 8
+        shot_colors = ball_colors + self.max_balls * 2
+        return ball_positions, shot_positions, ball_colors, shot_colors
+
+    def get_seq(self, slot: int) -> int:
+        return struct.unpack_from("q", self.shm.buf, self._slot_start(slot))[0]
+
+    def get_latest(self) -> int:
+        return _header.unpack_from(self.shm.buf, 0)[0]
+
+    def write(self, tick: int, level: int, score: int, progress: float, flags: int,
+              heading: tuple[float, float], held_color: int, reserve_color: int,
+              ball_positions: array, ball_colors: array,
+              shot_positions: array, shot_colors: array, message: str = "", input_seq: int = 0):
+        """ Publish one tick, positions are array('f') of x, y pairs and colors array('h')
+
+        input_seq is the number of the last input the tick includes.
+        """
+        ball_count = len(ball_colors)
+        shot_count = len(shot_colors)
+        if ball_count > self.max_balls or shot_count > self.max_shots:
+            if self.truncated == 0:
+                log.warning("Frame has %d balls and %d shots, only %d and %d fit",
+                            ball_count, shot_count, self.max_balls, self.max_shots)
+            self.truncated += 1
+            ball_count = min(ball_count, self.max_balls)
+            shot_count = min(shot_count, self.max_shots)
+
+        latest = self.get_latest()
+        slot = 0 if latest != 0 else 1
+        start = self._slot_start(slot)
+        buf = self.shm.buf
+        seq = self.get_seq(slot) + 1
+
+        # Odd while writing
+        struct.pack_into("q", buf, start, seq)
+        offsets = self.offsets(slot)
+        self._copy(ball_positions, ball_count * 2, offsets[0])
+        self._copy(shot_positions, shot_count * 2, offsets[1])
+        self._copy(ball_colors, ball_count, offsets[2])
+        self._copy(shot_colors, shot_count, offsets[3])
+        # The rest of the header while seq is still odd, the copy into shared
+        # memory is not atomic, then the even seq on its own to finish
+        _slot_header.pack_into(buf, start, seq, tick, input_seq, level, score, progress, flags,
+                               heading[0], heading[1], held_color, reserve_color, ball_count, shot_count,
+                               message.encode("utf-8")[:MESSAGE_BYTES])
+        struct.pack_into("q", buf, start, seq + 1)
+        _header.pack_into(buf, 0, slot)
+
+    def _copy(self, values: array, count: int, offset: int):
+        if count == 0:
+            return
+        data = memoryview(values)[:count].cast('B')
+        self.shm.buf[offset:offset + len(data)] = data
+        data.release()
+
+    def read(self) -> FrameView | None:
+        """ The newest complete slot, None if nothing was written yet """
+        while True:
+            slot = self.get_latest()
+            if slot < 0:
+                return None
+            values = _slot_header.unpack_from(self.shm.buf, self._slot_start(slot))
+            seq = values[0]
+            # Mid write, or overwritten while we were reading the header
+            if seq % 2 == 1 or self.get_seq(slot) != seq:
+                continue
+            return FrameView(self, slot, seq, values)
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
@@ -0,0 +1,119 @@
+import math
+
+# Uniform grid used to speed up spatial queries (ray casts, nearest path segment)
+
+class SpatialGrid:
+    def __init__(self, cell_size: float = 40):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list] = {}
+        # Bounds of everything inserted, used to clip ray casts
+        self.min_x = self.min_y = float('inf')
+        self.max_x = self.max_y = float('-inf')
+
+    def clear(self):
+        self.cells.clear()
+        self.min_x = self.min_y = float('inf')
+        self.max_x = self.max_y = float('-inf')
+
+    def get_cell(self, x: float, y: float) -> tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def insert(self, item, min_x: float, min_y: float, max_x: float, max_y: float):
+        """ Add an item to every cell overlapped by its bounding box """
+        self.min_x = min(self.min_x, min_x)
+        self.min_y = min(self.min_y, min_y)
+        self.max_x = max(self.max_x, max_x)
+        self.max_y = max(self.max_y, max_y)
+
+        start_x, start_y = self.get_cell(min_x, min_y)
+        end_x, end_y = self.get_cell(max_x, max_y)
+        for cx in range(start_x, end_x + 1):
+            for cy in range(start_y, end_y + 1):
+                self.cells.setdefault((cx, cy), []).append(item)
+
+    def query_rect(self, min_x: float, min_y: float, max_x: float, max_y: float) -> set:
+        """ Return the items of every cell overlapped by the rectangle """
+        found = set()
+        start_x, start_y = self.get_cell(min_x, min_y)
+        end_x, end_y = self.get_cell(max_x, max_y)
+        if (end_x - start_x + 1) * (end_y - start_y + 1) > len(self.cells):
+            # A large rectangle over a sparse grid, cheaper to look at what's there
+            for (cx, cy), items in self.cells.items():
+                if start_x <= cx <= end_x and start_y <= cy <= end_y:
+                    found.update(items)
+            return found
+        for cx in range(start_x, end_x + 1):
+            for cy in range(start_y, end_y + 1):
+                items = self.cells.get((cx, cy))
+                if items:
+                    found.update(items)
+        return found
+
+    def traverse_ray(self, origin_x: float, origin_y: float,
+                     heading_x: float, heading_y: float, max_distance: float):
+        """
+        Yield (items, t_exit) for every non-empty cell the ray passes through,
+        in order along the ray. t_exit is the ray distance where it leaves the cell.
+        """
+        t_enter, t_leave = self._clip_ray(origin_x, origin_y, heading_x, heading_y)
+        max_distance = min(max_distance, t_leave)
+        if t_enter > max_distance:
+            return
+
+        # Start where the ray enters the occupied area
+        origin_x += heading_x * t_enter
+        origin_y += heading_y * t_enter
+        max_distance -= t_enter
+
+        cx, cy = self.get_cell(origin_x, origin_y)
+        size = self.cell_size
+
+        step_x = 1 if heading_x > 0 else -1
+        step_y = 1 if heading_y > 0 else -1
+
+        if heading_x != 0:
+            next_x = (cx + (1 if step_x > 0 else 0)) * size
+            t_max_x = (next_x - origin_x) / heading_x
+            t_delta_x = size / abs(heading_x)
+        else:
+            t_max_x = t_delta_x = float('inf')
+
+        if heading_y != 0:
+            next_y = (cy + (1 if step_y > 0 else 0)) * size
+            t_max_y = (next_y - origin_y) / heading_y
+            t_delta_y = size / abs(heading_y)
+        else:
+            t_max_y = t_delta_y = float('inf')
+
+        t = 0
+        while t <= max_distance:
+            t_exit = min(t_max_x, t_max_y)
+            items = self.cells.get((cx, cy))
+            if items:
+                yield items, t_exit + t_enter
+
+            if t_max_x < t_max_y:
+                cx += step_x
+                t = t_max_x
+                t_max_x += t_delta_x
+            else:
+                cy += step_y
+                t = t_max_y
+                t_max_y += t_delta_y
+
+    def _clip_ray(self, origin_x: float, origin_y: float,
+                  heading_x: float, heading_y: float) -> tuple[float, float]:
+        """ Ray distances where it enters and leaves the bounds of the grid contents """
+        t_enter = 0
+        t_leave = float('inf')
+        for origin, heading, low, high in ((origin_x, heading_x, self.min_x, self.max_x),
+                                           (origin_y, heading_y, self.min_y, self.max_y)):
+            if heading == 0:
+                if origin < low or origin > high:
+                    return float('inf'), 0
+                continue
+            t1 = (low - origin) / heading
+            t2 = (high - origin) / heading
+            t_enter = max(t_enter, min(t1, t2))
+            t_leave = min(t_leave, max(t1, t2))
+        return t_enter, t_leave